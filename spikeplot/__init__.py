@@ -28,9 +28,10 @@ del matplotlib, os, platform
 
 from .common import check_plotting_handle, save_figure, COLOURS, plt, mpl
 from .plot_cluster import cluster
-from .plot_cluster_projection import cluster_projection
-from .plot_mcdata import mcdata
-from .plot_spike_trains import spike_trains
+from .plot_cluster_projection import cluster_projection, cluster_separability
+from .plot_correlograms import correlograms, correlogram_counts, isi_counts
+from .plot_mcdata import mcdata, mcdata_pyramid
+from .plot_spike_trains import spike_trains, spike_train_alignment
 from .plot_waveforms import waveforms
 from .plot_xvf_tensor import xvf_tensor
 
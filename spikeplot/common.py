@@ -8,7 +8,8 @@
 
 """basic stuff for plotting"""
 __docformat__ = "restructuredtext"
-__all__ = ["check_plotting_handle", "save_figure", "COLOURS", "plt", "mpl"]
+__all__ = ["check_plotting_handle", "save_figure", "COLOURS", "CHUNK_SIZE",
+           "plt", "mpl"]
 
 ## IMPORTS
 
@@ -41,6 +42,9 @@ usage:
         ax.plot(myline[i], c=COLOURS[i%NCOL])
 """
 
+CHUNK_SIZE = 10000
+"""number of observations processed at once by chunked computations"""
+
 
 ##---FUNCTIONS
 
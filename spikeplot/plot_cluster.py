@@ -13,14 +13,268 @@ __all__ = ['cluster']
 
 ##---IMPORTS
 
-from .common import COLOURS, save_figure, check_plotting_handle, mpl, plt
+import scipy as sp
+from .common import (COLOURS, CHUNK_SIZE, save_figure, check_plotting_handle,
+                     mpl, plt)
 
 
 ##---FUNCTION
 
-def cluster(data, data_dim=(0, 1), plot_handle=None, plot_mean=True,
+def _cluster_density(data, keys, data_dim, col_lst, shape, bounds=None):
+    """aggregate the clusters onto a pixel grid and blend their colours
+
+    Each cluster is binned with a single bincount over the flat pixel index.
+    The colour of a pixel is the count-weighted mix of the cluster colours,
+    its alpha is scaled by the log of the total count.
+
+    :Parameters:
+        data : dict
+            Dict of ndarray, one observation per row.
+        keys : list
+            The keys of `data` to use, in colour order.
+        data_dim : tuple
+            The two dimensions (columns) to use.
+        col_lst : list
+            List of colours in any matplotlib conform colour representation.
+        shape : tuple
+            The (nx, ny) size of the pixel grid.
+        bounds : tuple
+            The (xmin, xmax, ymin, ymax) extent of the grid. If None, the
+            bounds of the data are used.
+    :Returns:
+        ndarray
+            RGBA image of shape (ny, nx, 4), with origin at the lower left.
+        tuple
+            The (xmin, xmax, ymin, ymax) extent of the image.
+    """
+
+    nx, ny = int(shape[0]), int(shape[1])
+    if bounds is None:
+        xmin = min([data[k][:, data_dim[0]].min() for k in keys])
+        xmax = max([data[k][:, data_dim[0]].max() for k in keys])
+        ymin = min([data[k][:, data_dim[1]].min() for k in keys])
+        ymax = max([data[k][:, data_dim[1]].max() for k in keys])
+        bounds = xmin, xmax, ymin, ymax
+    xmin, xmax, ymin, ymax = map(float, bounds)
+    sx = nx / (xmax - xmin) if xmax > xmin else 0.0
+    sy = ny / (ymax - ymin) if ymax > ymin else 0.0
+    rgb = sp.zeros((nx * ny, 3))
+    total = sp.zeros(nx * ny)
+    for i, k in enumerate(keys):
+        ix = ((data[k][:, data_dim[0]] - xmin) * sx).astype(int)
+        iy = ((data[k][:, data_dim[1]] - ymin) * sy).astype(int)
+        sp.clip(ix, 0, nx - 1, out=ix)
+        sp.clip(iy, 0, ny - 1, out=iy)
+        counts = sp.bincount(iy * nx + ix, minlength=nx * ny)
+        rgb += sp.outer(counts, mpl.colors.colorConverter.to_rgb(
+            col_lst[i % len(col_lst)]))
+        total += counts
+    rval = sp.zeros((nx * ny, 4))
+    hit = total > 0
+    rval[hit, :3] = rgb[hit] / total[hit, None]
+    if hit.any():
+        rval[:, 3] = sp.log1p(total) / sp.log1p(total.max())
+    return rval.reshape(ny, nx, 4), (xmin, xmax, ymin, ymax)
+
+
+def _cluster_stats(data, keys, with_cov=False, chunk_size=CHUNK_SIZE):
+    """compute the per cluster statistics shared by all panels
+
+    The clusters are read in chunks of `chunk_size` rows, so memory-mapped
+    clusters larger than memory can be used. The covariances are accumulated
+    per chunk from the data shifted by the mean of the first chunk, which
+    keeps the one-pass computation numerically stable.
+
+    :Parameters:
+        data : dict
+            Dict of ndarray, one observation per row.
+        keys : list
+            The keys of `data` to use.
+        with_cov : bool
+            If True, also compute the covariance matrices.
+        chunk_size : int
+            Number of observations to process at once.
+    :Returns:
+        ndarray
+            The cluster means as (ncluster, ndim).
+        ndarray
+            The (min, max) bounds over all clusters as (2, ndim).
+        ndarray
+            The cluster covariances as (ncluster, ndim, ndim), or None if
+            `with_cov` is False.
+    """
+
+    nk, nd = len(keys), data[keys[0]].shape[1]
+    means = sp.zeros((nk, nd))
+    covs = None
+    if with_cov is True:
+        covs = sp.zeros((nk, nd, nd))
+    bounds = sp.array([sp.zeros(nd) + sp.inf, sp.zeros(nd) - sp.inf])
+    for i, k in enumerate(keys):
+        n = data[k].shape[0]
+        shift = sp.asarray(data[k][:chunk_size], dtype=float).mean(axis=0)
+        for start in xrange(0, n, chunk_size):
+            chunk = sp.asarray(data[k][start:start + chunk_size],
+                               dtype=float) - shift
+            means[i] += chunk.sum(axis=0)
+            if covs is not None:
+                covs[i] += sp.dot(chunk.T, chunk)
+            bounds[0] = sp.minimum(bounds[0], chunk.min(axis=0) + shift)
+            bounds[1] = sp.maximum(bounds[1], chunk.max(axis=0) + shift)
+        means[i] /= n
+        if covs is not None:
+            covs[i] = covs[i] / n - sp.outer(means[i], means[i])
+        means[i] += shift
+    return means, bounds, covs
+
+
+def _cov_ellipses(means, covs, pairs, nstd=1.0, npoints=65):
+    """outlines of the `nstd`-sigma ellipses for all clusters and pairs
+
+    The eigendecomposition of all 2x2 covariance sub-matrices is computed at
+    once in closed form.
+
+    :Parameters:
+        means : ndarray
+            The cluster means as (ncluster, ndim).
+        covs : ndarray
+            The cluster covariances as (ncluster, ndim, ndim).
+        pairs : list
+            List of (x, y) dimension pairs.
+        nstd : float
+            Size of the ellipses in standard deviations.
+        npoints : int
+            Number of vertices per ellipse.
+    :Returns:
+        ndarray
+            The ellipse outlines as (npairs, ncluster, npoints, 2).
+    """
+
+    ix = sp.array([p[0] for p in pairs])
+    iy = sp.array([p[1] for p in pairs])
+    # 2x2 sub-matrices [[a, b], [b, c]] as (ncluster, npairs)
+    a, b, c = covs[:, ix, ix], covs[:, ix, iy], covs[:, iy, iy]
+    root = sp.sqrt(((a - c) / 2.0) ** 2 + b ** 2)
+    major = nstd * sp.sqrt(sp.maximum((a + c) / 2.0 + root, 0))
+    minor = nstd * sp.sqrt(sp.maximum((a + c) / 2.0 - root, 0))
+    phi = 0.5 * sp.arctan2(2 * b, a - c)
+    t = sp.linspace(0, 2 * sp.pi, npoints)
+    ct, st = sp.cos(t), sp.sin(t)
+    rval = sp.empty((len(pairs), means.shape[0], npoints, 2))
+    rval[..., 0] = (means[:, ix].T[..., None] +
+                    (major * sp.cos(phi)).T[..., None] * ct -
+                    (minor * sp.sin(phi)).T[..., None] * st)
+    rval[..., 1] = (means[:, iy].T[..., None] +
+                    (major * sp.sin(phi)).T[..., None] * ct +
+                    (minor * sp.cos(phi)).T[..., None] * st)
+    return rval
+
+
+def _cluster_hist(data, keys, dims, bounds, nbins=50):
+    """histograms of the clusters for several dimensions at once
+
+    Each cluster is binned over all `dims` with a single bincount over the
+    flat (dimension, bin) index.
+
+    :Parameters:
+        data : dict
+            Dict of ndarray, one observation per row.
+        keys : list
+            The keys of `data` to use.
+        dims : list
+            The dimensions (columns) to use.
+        bounds : ndarray
+            The (min, max) bounds as (2, ndim) for all dimensions.
+        nbins : int
+            Number of bins per dimension.
+    :Returns:
+        ndarray
+            The counts as (ncluster, len(dims), nbins).
+        ndarray
+            The bin centers as (len(dims), nbins).
+    """
+
+    lo, hi = bounds[0, dims], bounds[1, dims]
+    width = hi - lo
+    width[width == 0] = 1.0
+    scale = nbins / width
+    offset = sp.arange(len(dims)) * nbins
+    rval = sp.zeros((len(keys), len(dims), nbins), dtype=int)
+    for i, k in enumerate(keys):
+        idx = ((data[k][:, dims] - lo) * scale).astype(int)
+        sp.clip(idx, 0, nbins - 1, out=idx)
+        rval[i] = sp.bincount((idx + offset).ravel(),
+                              minlength=len(dims) * nbins).reshape(-1, nbins)
+    centers = lo[:, None] + (sp.arange(nbins) + 0.5) * (width / nbins)[:, None]
+    return rval, centers
+
+
+def _cluster_panel(ax, data, keys, data_dim, col_lst, means, bounds,
+                   plot_mean, mode, density_bins, ellipses=None):
+    """plot the clusters for one pair of dimensions on `ax`"""
+
+    # plot single cluster members
+    if mode == 'density':
+        if density_bins is None:
+            density_bins = ax.bbox.width, ax.bbox.height
+        elif sp.isscalar(density_bins):
+            density_bins = density_bins, density_bins
+        img, extent = _cluster_density(
+            data, keys, data_dim, col_lst, density_bins,
+            (bounds[0, data_dim[0]], bounds[1, data_dim[0]],
+             bounds[0, data_dim[1]], bounds[1, data_dim[1]]))
+        ax.imshow(img, origin='lower', aspect='auto', interpolation='nearest',
+                  extent=extent)
+    else:
+        col_idx = 0
+        for k in keys:
+            ax.plot(
+                data[k][:, data_dim[0]],
+                data[k][:, data_dim[1]],
+                marker='.',
+                lw=0,
+                c=col_lst[col_idx % len(col_lst)])
+            col_idx += 1
+
+    # plot cluster means
+    if plot_mean is not False:
+        col_idx = 0
+        for i in xrange(len(keys)):
+            my_mean = means[i, list(data_dim)]
+            ax.plot(
+                [my_mean[0]],
+                [my_mean[1]],
+                            lw=0,
+                            marker='x',
+                            mfc=col_lst[col_idx % len(col_lst)],
+                            ms=10,
+                            mew=1,
+                            mec='k')
+
+            # plot density estimates
+            if plot_mean is not True:
+                ax.add_artist(
+                    mpl.patches.Ellipse(
+                        xy=my_mean,
+                        width=plot_mean * 2,
+                        height=plot_mean * 2,
+                        facecolor='none',
+                        edgecolor=col_lst[col_idx % len(col_lst)]))
+            col_idx += 1
+
+    # plot covariance ellipses
+    if ellipses is not None:
+        ax.add_collection(
+            mpl.collections.LineCollection(
+                ellipses,
+                colors=[col_lst[i % len(col_lst)] for i in xrange(len(keys))],
+                zorder=3))
+
+
+def cluster(data, data_dim=None, plot_handle=None, plot_mean=True,
             colours=None, title=None, xlabel=None, ylabel=None, filename=None,
-            show=True):
+            show=True, mode='points', density_bins=None,
+            scatter_matrix=False, plot_cov=None):
     """plot a set of clusters with different colors each
 
     :Parameters:
@@ -28,7 +282,10 @@ def cluster(data, data_dim=(0, 1), plot_handle=None, plot_mean=True,
             Preferably a dictionary with ndarray entries.
         data_dim : tuple
             A 2-tuple giving the dimension (entries per datapoint/columns) to
-            use for the scatter plot of the cluster.
+            use for the scatter plot of the cluster. If scatter_matrix is
+            True, a sequence of dimensions to plot against each other. If
+            None, (0, 1) is used, or all dimensions if scatter_matrix is True.
+            Default=None
         plot_handle : figure or axis
             A reference to a figure or axis, or None if one has to be created.
         plot_mean : bool or float
@@ -51,11 +308,34 @@ def cluster(data, data_dim=(0, 1), plot_handle=None, plot_mean=True,
             It given and a valid path on the local system, save the figure.
         show : bool
             If True, show the figure.
+        mode : str
+            'points' plots every observation as a marker, 'density'
+            aggregates the clusters onto a pixel grid and draws them as one
+            image, with the colours of overlapping clusters blended.
+            Default='points'
+        density_bins : int or tuple
+            Size (nx, ny) of the pixel grid for mode='density'. If None, the
+            pixel size of the axis is used.
+            Default=None
+        scatter_matrix : bool
+            If True, plot every pair of the dimensions in `data_dim` in a
+            grid of axes, with the histograms of the clusters per dimension on
+            the diagonal. `xlabel` and `ylabel` are ignored in this case.
+            Default=False
+        plot_cov : float
+            If not None, plot the ellipses of that many standard deviations
+            of the cluster covariances. The covariances are computed in one
+            chunked pass per cluster, so memory-mapped data can be used.
+            Default=None
     :Returns:
         matplotlib.figure
             Reference th the figure plotted on
     """
 
+    # checks
+    if mode not in ['points', 'density']:
+        raise ValueError('unknown mode: %s' % mode)
+
     # colour list
     if colours is None:
         col_lst = COLOURS
@@ -63,55 +343,73 @@ def cluster(data, data_dim=(0, 1), plot_handle=None, plot_mean=True,
         col_lst = colours
 
     # setup Figure if necessary
-    fig, ax = check_plotting_handle(plot_handle)
+    fig, ax = check_plotting_handle(plot_handle,
+                                    create_ax=not scatter_matrix)
 
     if not isinstance(data, dict):
         data = {'0':data}
+    keys = sorted(data.keys())
+    means, bounds, covs = _cluster_stats(data, keys,
+                                         with_cov=plot_cov is not None)
 
-    # plot single cluster members
-    col_idx = 0
-    for k in sorted(data.keys()):
-        ax.plot(
-            data[k][:, data_dim[0]],
-            data[k][:, data_dim[1]],
-            marker='.',
-            lw=0,
-            c=col_lst[col_idx % len(col_lst)])
-        col_idx += 1
-
-    # plot cluster means
-    if plot_mean is not False:
-        col_idx = 0
-        for k in sorted(data.keys()):
-            my_mean = data[k][:, data_dim].mean(axis=0)
-            ax.plot(
-                [my_mean[0]],
-                [my_mean[1]],
-                            lw=0,
-                            marker='x',
-                            mfc=col_lst[col_idx % len(col_lst)],
-                            ms=10,
-                            mew=1,
-                            mec='k')
-
-            # plot density estimates
-            if plot_mean is not True:
-                ax.add_artist(
-                    mpl.patches.Ellipse(
-                        xy=my_mean,
-                        width=plot_mean * 2,
-                        height=plot_mean * 2,
-                        facecolor='none',
-                        edgecolor=col_lst[col_idx % len(col_lst)]))
-            col_idx += 1
+    if scatter_matrix is True:
+        if data_dim is None:
+            data_dim = range(bounds.shape[1])
+        data_dim = list(data_dim)
+        nd = len(data_dim)
+        fig.clear()
+        hist, centers = _cluster_hist(data, keys, data_dim, bounds)
+        pairs = [(data_dim[col], data_dim[row])
+                 for row in xrange(nd) for col in xrange(nd)]
+        ellipses = None
+        if covs is not None:
+            ellipses = _cov_ellipses(means, covs, pairs, plot_cov)
+        for row in xrange(nd):
+            for col in xrange(nd):
+                ax = fig.add_subplot(nd, nd, row * nd + col + 1)
+                if row == col:
+                    for i in xrange(len(keys)):
+                        ax.plot(centers[row], hist[i, row],
+                                drawstyle='steps-mid',
+                                c=col_lst[i % len(col_lst)])
+                    ax.set_yticklabels([])
+                else:
+                    _cluster_panel(ax, data, keys, pairs[row * nd + col],
+                                   col_lst, means, bounds, plot_mean, mode,
+                                   density_bins,
+                                   None if ellipses is None else
+                                   ellipses[row * nd + col])
+                    ax.set_ylim(bounds[0, data_dim[row]],
+                                bounds[1, data_dim[row]])
+                    if col > 0:
+                        ax.set_yticklabels([])
+                ax.set_xlim(bounds[0, data_dim[col]], bounds[1, data_dim[col]])
+                if row < nd - 1:
+                    ax.set_xticklabels([])
+                else:
+                    ax.set_xlabel('dim %s' % data_dim[col])
+                if col == 0:
+                    ax.set_ylabel('dim %s' % data_dim[row])
+    else:
+        if data_dim is None:
+            data_dim = (0, 1)
+        ellipses = None
+        if covs is not None:
+            ellipses = _cov_ellipses(means, covs, [data_dim], plot_cov)[0]
+        _cluster_panel(ax, data, keys, data_dim, col_lst, means, bounds,
+                       plot_mean, mode, density_bins, ellipses)
 
     # fancy stuff
     if title is not None:
-        ax.set_title(title)
-    if xlabel is not None:
-        ax.set_xlabel(xlabel)
-    if ylabel is not None:
-        ax.set_ylabel(ylabel)
+        if scatter_matrix is True:
+            fig.suptitle(title)
+        else:
+            ax.set_title(title)
+    if scatter_matrix is not True:
+        if xlabel is not None:
+            ax.set_xlabel(xlabel)
+        if ylabel is not None:
+            ax.set_ylabel(ylabel)
 
     # produce plots
     if filename is not None:
@@ -8,21 +8,295 @@
 
 """scatter plot for clustering data"""
 __docformat__ = 'restructuredtext'
-__all__ = ['cluster_projection']
+__all__ = ['cluster_projection', 'cluster_separability']
 
 
 ##---IMPORTS
 
+import multiprocessing
 import scipy as sp
-from scipy import linalg as sp_la
 from scipy.stats import norm
-from .common import COLOURS, save_figure, check_plotting_handle, plt
+from .common import (COLOURS, CHUNK_SIZE, save_figure, check_plotting_handle,
+                     plt, mpl)
+
+
+##---CONSTANTS
+
+GAUSS_UNIT_SIGMA = norm.pdf(sp.linspace(-4, 4, 51))
+"""unit gaussian evaluated on [-4, 4], overlaid on the projection histograms"""
 
 
 ##---FUNCTION
 
+def _connecting_units(means):
+    """unit vectors connecting all pairs of cluster means
+
+    :Parameters:
+        means : ndarray
+            The cluster means as (nu, ndim).
+    :Returns:
+        ndarray
+            The unit vectors as (nu, nu, ndim), where entry [i, j] points from
+            the mean of cluster j to the mean of cluster i. The diagonal is
+            zero.
+    """
+
+    units = means[:, None, :] - means[None, :, :]
+    norms = sp.sqrt((units ** 2).sum(axis=-1))
+    sp.fill_diagonal(norms, 1.0)
+    return units / norms[..., None]
+
+
+def _projection_stats(args):
+    """moments and bounds of one cluster projected on its unit vectors
+
+    The cluster is projected in chunks of CHUNK_SIZE observations, the
+    projections are not kept.
+
+    :Parameters:
+        args : tuple
+            (cluster, units) with the cluster data as (nobs, ndim) and its
+            unit vectors as (nu, ndim).
+    :Returns:
+        tuple
+            (mean, var, min, max) of the projections, each as (nu,).
+    """
+
+    cluster, units = args
+    mean = sp.dot(cluster.mean(axis=0), units.T)
+    sqdev = sp.zeros(units.shape[0])
+    pmin = sp.zeros(units.shape[0]) + sp.inf
+    pmax = sp.zeros(units.shape[0]) - sp.inf
+    for start in xrange(0, cluster.shape[0], CHUNK_SIZE):
+        proj = sp.dot(cluster[start:start + CHUNK_SIZE], units.T)
+        sqdev += ((proj - mean) ** 2).sum(axis=0)
+        pmin = sp.minimum(pmin, proj.min(axis=0))
+        pmax = sp.maximum(pmax, proj.max(axis=0))
+    return mean, sqdev / cluster.shape[0], pmin, pmax
+
+
+def _projection_hist(args):
+    """histograms of one cluster projected on its unit vectors
+
+    The cluster is projected in chunks of CHUNK_SIZE observations, and all
+    nu histograms of a chunk are built with a single bincount over the flat
+    (direction, bin) index.
+
+    :Parameters:
+        args : tuple
+            (cluster, units, lo, hi, nbins) with the cluster data as
+            (nobs, ndim), its unit vectors as (nu, ndim), the lower and upper
+            bin edges per direction as (nu,) and the number of bins.
+    :Returns:
+        ndarray
+            The counts as (nu, nbins).
+    """
+
+    cluster, units, lo, hi, nbins = args
+    nu = units.shape[0]
+    width = hi - lo
+    width[width == 0] = 1.0
+    rval = sp.zeros(nu * nbins, dtype=int)
+    for start in xrange(0, cluster.shape[0], CHUNK_SIZE):
+        proj = sp.dot(cluster[start:start + CHUNK_SIZE], units.T)
+        idx = ((proj - lo) * (nbins / width)).astype(int)
+        sp.clip(idx, 0, nbins - 1, out=idx)
+        rval += sp.bincount((idx + sp.arange(nu) * nbins).ravel(),
+                            minlength=nu * nbins)
+    return rval.reshape(nu, nbins)
+
+
+def cluster_separability(data, nbins=50, processes=None):
+    """compute the pairwise separability metrics behind `cluster_projection`
+
+    Every cluster is projected onto the vectors connecting its mean to the
+    means of all other clusters, no figure is created. For each pair the
+    histograms of both clusters share the same bin edges.
+
+    :Parameters:
+        data : dict
+            dict with cluster data in one ndarray (one observation per row).
+            This data has to be whitened so the distance measure actually make
+            sense!
+        nbins : int
+            Number of histogram bins per pair.
+            Default=50
+        processes : int
+            If not None, distribute the clusters over a process pool with
+            that many worker processes.
+            Default=None
+    :Returns:
+        dict
+            With the sorted keys of `data` under 'keys' and the metrics as
+            (nu, nu) ndarrays, where entry [i, j] refers to cluster i
+            projected on the vector pointing from cluster j to cluster i:
+            'mean' and 'var' of the projection, the symmetric 'dprime' and
+            'overlap' (the common area of both normalised histograms, between
+            0 and 1). Further 'hist' as (nu, nu, nbins) and the bin edges
+            'lo' and 'hi'. Bins of [j, i] are mirrored to those of [i, j].
+    """
+
+    # prepare data
+    if not isinstance(data, dict):
+        data = {'0':data}
+    keys = sorted(data.keys())
+    nu = len(keys)
+    if nu < 2:
+        raise ValueError('only one unit passed!')
+
+    # init
+    means = sp.array([data[k].mean(axis=0) for k in keys])
+    units = _connecting_units(means)
+    pool = None
+    mapper = map
+    if processes is not None:
+        pool = multiprocessing.Pool(processes)
+        mapper = pool.map
+
+    try:
+        # projected moments and bounds
+        stats = list(mapper(_projection_stats,
+                            [(data[k], units[i]) for i, k in enumerate(keys)]))
+        mean, var, pmin, pmax = [sp.array([st[j] for st in stats])
+                                 for j in xrange(4)]
+
+        # shared bin edges per pair, mirrored for [j, i]
+        lo = sp.minimum(pmin, -pmax.T)
+        hi = sp.maximum(pmax, -pmin.T)
+        hist = sp.array(list(
+            mapper(_projection_hist,
+                   [(data[k], units[i], lo[i], hi[i], nbins)
+                    for i, k in enumerate(keys)])))
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+
+    # metrics
+    spread = sp.sqrt((var + var.T) / 2.0)
+    sp.fill_diagonal(spread, 1.0)
+    dprime = (mean + mean.T) / spread
+    sp.fill_diagonal(dprime, 0.0)
+    pdf = hist / hist.sum(axis=-1)[..., None].astype(float)
+    overlap = sp.minimum(pdf, pdf.transpose(1, 0, 2)[..., ::-1]).sum(axis=-1)
+    sp.fill_diagonal(overlap, 1.0)
+    return {'keys':keys, 'mean':mean, 'var':var, 'dprime':dprime,
+            'overlap':overlap, 'hist':hist, 'lo':lo, 'hi':hi}
+
+
+def _step_polygon(edges, values):
+    """vertices of the closed step outline of a histogram
+
+    :Parameters:
+        edges : ndarray
+            The bin edges as (nbins + 1,).
+        values : ndarray
+            The bin values as (nbins,).
+    :Returns:
+        ndarray
+            The polygon vertices as (2 * nbins + 2, 2).
+    """
+
+    return sp.vstack((sp.repeat(edges, 2),
+                      sp.hstack(([0], sp.repeat(values, 2), [0])))).T
+
+
+def _projection_panel(ax, metrics, a, b, col_a, col_b):
+    """plot the projection of the cluster pair (a, b) on `ax`
+
+    :Parameters:
+        ax : matplotlib.axis
+            The axis to plot on.
+        metrics : dict
+            The metrics as returned by `cluster_separability`.
+        a : int
+            Index of the first cluster.
+        b : int
+            Index of the second cluster.
+        col_a : object
+            Colour of the first cluster.
+        col_b : object
+            Colour of the second cluster.
+    """
+
+    # histograms on the vector [a, b], the bins of [b, a] are mirrored
+    nbins = metrics['hist'].shape[-1]
+    edges = sp.linspace(metrics['lo'][a, b], metrics['hi'][a, b], nbins + 1)
+    width = edges[1] - edges[0] or 1.0
+    ax.add_collection(
+        mpl.collections.PolyCollection(
+            [_step_polygon(edges, counts / (counts.sum() * width))
+             for counts in [metrics['hist'][a, b], metrics['hist'][b, a][::-1]]],
+            facecolors=[col_a, col_b], edgecolors=[col_a, col_b]))
+    ax.autoscale_view()
+
+    # plot gauss
+    for mean_proj in [metrics['mean'][a, b], -metrics['mean'][b, a]]:
+        ax.plot(sp.linspace(mean_proj - 4, mean_proj + 4, 51),
+                GAUSS_UNIT_SIGMA, color='k')
+
+    # jail yaxis
+    ax.set_ybound(0.0, 0.5)
+    ax.set_yticklabels([])
+
+
+def _projection_grid(fig, metrics, rows, col_lst):
+    """add the panels of the given grid rows to `fig`
+
+    :Parameters:
+        fig : matplotlib.figure
+            The figure to plot on.
+        metrics : dict
+            The metrics as returned by `cluster_separability`.
+        rows : list
+            The rows of the (nu - 1) x (nu - 1) grid to plot.
+        col_lst : list
+            List of colours in any matplotlib conform colour representation.
+    """
+
+    nu = len(metrics['keys'])
+    for row in rows:
+        for col in xrange(nu - 1 - row):
+            # create subplot at correct position
+            myax = fig.add_subplot(nu - 1, nu - 1, row * nu + col + 1)
+            _projection_panel(myax, metrics, row, row + col + 1,
+                              col_lst[row % len(col_lst)],
+                              col_lst[(row + col + 1) % len(col_lst)])
+
+
+def _render_grid(args):
+    """render some rows of the projection grid to an RGBA image
+
+    Runs in a worker process and uses the Agg canvas directly, independent of
+    the backend selected in the parent process. The figure background is
+    transparent, so the images of all workers can be composited.
+
+    :Parameters:
+        args : tuple
+            (metrics, rows, col_lst, figsize, dpi) with the metrics as
+            returned by `cluster_separability`, the grid rows to render, the
+            colour list and the size and dpi of the target figure.
+    :Returns:
+        ndarray
+            The rendered image as (height, width, 4) uint8 array.
+    """
+
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    metrics, rows, col_lst, figsize, dpi = args
+    fig = Figure(figsize=figsize, dpi=dpi)
+    canvas = FigureCanvasAgg(fig)
+    fig.patch.set_alpha(0.0)
+    _projection_grid(fig, metrics, rows, col_lst)
+    canvas.draw()
+    width, height = canvas.get_width_height()
+    return sp.frombuffer(canvas.buffer_rgba(), dtype=sp.uint8).reshape(
+        height, width, 4)
+
+
 def cluster_projection(data, colours=None, plot_handle=None, filename=None,
-                       show=True):
+                       show=True, processes=None):
     """produce a plot with the cluster projections according to [citation]
 
     :Parameters:
@@ -39,6 +313,13 @@ def cluster_projection(data, colours=None, plot_handle=None, filename=None,
             It given and a valid path on the local system, save the figure.
         show : bool
             If True, show the figure.
+        processes : int
+            If not None, compute the pair statistics in a process pool with
+            that many worker processes, and render the rows of the grid in
+            the worker processes with the Agg backend. The rendered rows are
+            composited into one image that is shown in the figure, so the
+            panels are not interactive in this case.
+            Default=None
     :Returns:
         matplotlib.figure
             Reference th the figure ploted on
@@ -61,45 +342,36 @@ def cluster_projection(data, colours=None, plot_handle=None, filename=None,
     fig, ax = check_plotting_handle(plot_handle, create_ax=False)
     fig.clear()
 
+    # project all clusters on all connecting vectors and bin them at once
+    metrics = cluster_separability(data, nbins=50, processes=processes)
+
     # plot pairwise inter-cluster distributions
-    GAUSS_UNIT_SIGMA = norm.pdf(sp.linspace(-4, 4, 51))
-    axidx = 0
-    for row in xrange(nu - 1):
-        for col in xrange(nu - 1 - row):
-            # create subplot at correct position
-            myax = fig.add_subplot(nu - 1, nu - 1, row * nu + col + 1)
-            axidx += 1
-            # whiten data and calc cluster means and connecting vectors
-            clusterA = data[sorted(data.keys())[row]]
-            clusterAmean = clusterA.mean(axis=0)
-            clusterAproj = sp.array(clusterA.shape[0])
-            clusterB = data[sorted(data.keys())[row + col + 1]]
-            clusterBmean = clusterB.mean(axis=0)
-            clusterBproj = sp.array(clusterB.shape[0])
-            # project on vector connecting the cluster means
-            con = clusterAmean - clusterBmean
-            con = con / sp_la.norm(con)
-            clusterAproj = sp.dot(clusterA, con)
-            clusterAmean_proj = sp.dot(clusterAmean, con)
-            clusterBproj = sp.dot(clusterB, con)
-            clusterBmean_proj = sp.dot(clusterBmean, con)
-            # plot histos
-            myax.hist(clusterAproj, 50, align='mid', normed=True,
-                      facecolor=col_lst[row % len(col_lst)],
-                      edgecolor=col_lst[row % len(col_lst)])
-            myax.hist(clusterBproj, 50, align='mid', normed=True,
-                      facecolor=col_lst[(row + col + 1) % len(col_lst)],
-                      edgecolor=col_lst[(row + col + 1) % len(col_lst)])
-            # plot gauss
-            myax.plot(
-                sp.linspace(clusterAmean_proj - 4, clusterAmean_proj + 4, 51),
-                GAUSS_UNIT_SIGMA, color='k')
-            myax.plot(
-                sp.linspace(clusterBmean_proj - 4, clusterBmean_proj + 4, 51),
-                GAUSS_UNIT_SIGMA, color='k')
-            # jail yaxis
-            myax.set_ybound(0.0, 0.5)
-            myax.set_yticklabels([])
+    if processes is None:
+        _projection_grid(fig, metrics, range(nu - 1), col_lst)
+    else:
+        # rows get shorter towards the bottom, so deal them out round robin
+        pool = multiprocessing.Pool(processes)
+        try:
+            images = pool.map(
+                _render_grid,
+                [(metrics, range(nu - 1)[i::processes], col_lst,
+                  tuple(fig.get_size_inches()), fig.dpi)
+                 for i in xrange(min(processes, nu - 1))])
+        finally:
+            pool.close()
+            pool.join()
+        # composite the images, the panels of the workers do not overlap
+        composite = sp.zeros(images[0].shape)
+        composite[:] = 255.0 * sp.asarray(
+            mpl.colors.colorConverter.to_rgba(fig.get_facecolor()))
+        for img in images:
+            alpha = img[..., 3:] / 255.0
+            composite = img * alpha + composite * (1.0 - alpha)
+        composite[..., 3] = 255
+        myax = fig.add_axes((0, 0, 1, 1))
+        myax.imshow(composite.astype(sp.uint8), aspect='auto',
+                    interpolation='nearest')
+        myax.set_axis_off()
 
     # produce plots
     if filename is not None:
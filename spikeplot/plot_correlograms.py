@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+#
+# spikeplot - plot_correlograms.py
+#
+# Philipp Meier <pmeier82 at googlemail dot com>
+# 2026-10-18
+#
+
+"""auto-/cross-correlograms and inter-spike interval histograms"""
+__docformat__ = 'restructuredtext'
+__all__ = ['correlograms', 'correlogram_counts', 'isi_counts']
+
+
+##---IMPORTS
+
+import multiprocessing
+import scipy as sp
+from .common import (COLOURS, CHUNK_SIZE, save_figure, check_plotting_handle,
+                     plt)
+
+
+##---FUNCTION
+
+def _correlogram_pair(args):
+    """correlogram counts for one pair of sorted spike trains
+
+    For every spike of the first train the spikes of the second train within
+    the lag window are found with searchsorted, the lags are then gathered in
+    chunks of CHUNK_SIZE spikes, so the cost is O(n log n + npairs) with
+    bounded memory.
+
+    :Parameters:
+        args : tuple
+            (train1, train2, bin_size, nlag, auto) with the sorted spike
+            times, the bin size, the number of bins on either side of the
+            zero lag bin and whether train1 and train2 are the same train,
+            in which case the zero lag of each spike with itself is excluded.
+    :Returns:
+        ndarray
+            The counts as (2 * nlag + 1,) for the lags of train2 relative to
+            train1.
+    """
+
+    train1, train2, bin_size, nlag, auto = args
+    nbins = 2 * nlag + 1
+    max_lag = (nlag + 0.5) * bin_size
+    rval = sp.zeros(nbins, dtype=int)
+    lo = train2.searchsorted(train1 - max_lag, 'left')
+    hi = train2.searchsorted(train1 + max_lag, 'right')
+    for start in xrange(0, train1.size, CHUNK_SIZE):
+        c_lo = lo[start:start + CHUNK_SIZE]
+        c_n = hi[start:start + CHUNK_SIZE] - c_lo
+        total = c_n.sum()
+        if total == 0:
+            continue
+        # indices into train2 of all pairs, without a python loop
+        first = sp.cumsum(c_n) - c_n
+        idx2 = sp.repeat(c_lo - first, c_n) + sp.arange(total)
+        idx1 = sp.repeat(sp.arange(start, start + c_n.size), c_n)
+        if auto is True:
+            keep = idx1 != idx2
+            idx1, idx2 = idx1[keep], idx2[keep]
+        # round half a bin away from zero, so bins are symmetric in the lag
+        lags = train2[idx2] - train1[idx1]
+        bins = (sp.sign(lags) * sp.floor(sp.absolute(lags) / float(bin_size) +
+                                         0.5)).astype(int) + nlag
+        bins = bins[(bins >= 0) & (bins < nbins)]
+        rval += sp.bincount(bins, minlength=nbins)
+    return rval
+
+
+def correlogram_counts(spiketrains, max_lag, bin_size=1.0, processes=None):
+    """compute the auto- and cross-correlograms of all pairs of spike trains
+
+    :Parameters:
+        spiketrains : dict
+            Dict of 1d ndarray, holding the spike times.
+        max_lag : float
+            The maximal lag in units of the spike times.
+        bin_size : float
+            The bin size in units of the spike times. The zero lag is at the
+            center of a bin, lags of exactly half a bin are assigned to the
+            bin away from zero.
+            Default=1.0
+        processes : int
+            If not None, distribute the pairs over a process pool with that
+            many worker processes.
+            Default=None
+    :Returns:
+        dict
+            With the sorted keys under 'keys', the bin centers under 'lags'
+            and the counts under 'counts' as (nu, nu, nbins), where entry
+            [i, j] counts the lags of unit j relative to unit i.
+    """
+
+    keys = sorted(spiketrains.keys())
+    nu = len(keys)
+    nlag = int(round(max_lag / float(bin_size)))
+    trains = [sp.sort(sp.asarray(spiketrains[k], dtype=float)) for k in keys]
+    pairs = [(i, j) for i in xrange(nu) for j in xrange(i, nu)]
+    args = [(trains[i], trains[j], bin_size, nlag, i == j) for i, j in pairs]
+    if processes is None:
+        results = map(_correlogram_pair, args)
+    else:
+        pool = multiprocessing.Pool(processes)
+        try:
+            results = pool.map(_correlogram_pair, args)
+        finally:
+            pool.close()
+            pool.join()
+    counts = sp.zeros((nu, nu, 2 * nlag + 1), dtype=int)
+    for (i, j), res in zip(pairs, results):
+        counts[i, j] = res
+        if i != j:
+            counts[j, i] = res[::-1]
+    return {'keys':keys,
+            'lags':(sp.arange(2 * nlag + 1) - nlag) * bin_size,
+            'counts':counts}
+
+
+def isi_counts(spiketrains, max_isi, bin_size=1.0):
+    """compute the inter-spike interval histograms of all spike trains
+
+    :Parameters:
+        spiketrains : dict
+            Dict of 1d ndarray, holding the spike times.
+        max_isi : float
+            The maximal interval in units of the spike times.
+        bin_size : float
+            The bin size in units of the spike times.
+            Default=1.0
+    :Returns:
+        dict
+            With the sorted keys under 'keys', the bin centers under
+            'intervals' and the counts under 'counts' as (nu, nbins).
+    """
+
+    keys = sorted(spiketrains.keys())
+    nbins = int(sp.ceil(max_isi / float(bin_size)))
+    counts = sp.zeros((len(keys), nbins), dtype=int)
+    for i, k in enumerate(keys):
+        isi = sp.diff(sp.sort(sp.asarray(spiketrains[k], dtype=float)))
+        bins = (isi / float(bin_size)).astype(int)
+        counts[i] = sp.bincount(bins[bins < nbins], minlength=nbins)
+    return {'keys':keys,
+            'intervals':(sp.arange(nbins) + 0.5) * bin_size,
+            'counts':counts}
+
+
+def correlograms(spiketrains, max_lag, bin_size=1.0, samples_per_second=None,
+                 plot_isi=False, processes=None, plot_handle=None,
+                 colours=None, title=None, filename=None, show=True):
+    """plot the correlogram matrix of a set of spike trains
+
+    The auto-correlograms are plotted on the diagonal in the colour of the
+    unit, the cross-correlograms off the diagonal.
+
+    :Parameters:
+        spiketrains : dict
+            Dict of 1d ndarray, holding the spike times.
+        max_lag : float
+            The maximal lag in units of the spike times.
+        bin_size : float
+            The bin size in units of the spike times.
+            Default=1.0
+        samples_per_second : int
+            Scale parameter for the axis.
+            Default=None
+        plot_isi : bool
+            If True, add a row with the inter-spike interval histograms of
+            the units (up to `max_lag`) below the matrix.
+            Default=False
+        processes : int
+            If not None, compute the correlograms in a process pool with that
+            many worker processes.
+            Default=None
+        plot_handle : figure or axis
+            A reference to a figure or axis, or None if one has to be created.
+        colours : list
+            List of colours in any matplotlib conform colour representation.
+            Default=None
+        title : str
+            A title for the plot. No title if None or ''.
+        filename : str
+            If given and a valid path on the local system, save the figure.
+        show : bool
+            If True, show the figure.
+    :Returns:
+        matplotlib.figure
+            Reference th the figure plotted on
+    """
+
+    # checks
+    if not len(spiketrains):
+        raise ValueError('Provide at least one spiketrain!')
+
+    # colour list
+    if colours is None:
+        col_lst = COLOURS
+    else:
+        col_lst = colours
+
+    # setup figure if necessary
+    fig, ax = check_plotting_handle(plot_handle, create_ax=False)
+    fig.clear()
+
+    # init
+    srate = 1.0
+    if samples_per_second is not None:
+        srate = float(samples_per_second)
+    ccg = correlogram_counts(spiketrains, max_lag, bin_size, processes)
+    nu = len(ccg['keys'])
+    nrow = nu
+    if plot_isi is True:
+        nrow += 1
+
+    # plot correlogram matrix
+    for i in xrange(nu):
+        for j in xrange(nu):
+            ax = fig.add_subplot(nrow, nu, i * nu + j + 1)
+            col = 'k'
+            if i == j:
+                col = col_lst[i % len(col_lst)]
+            ax.plot(ccg['lags'] / srate, ccg['counts'][i, j],
+                    drawstyle='steps-mid', c=col)
+            ax.set_xlim(ccg['lags'][0] / srate, ccg['lags'][-1] / srate)
+            ax.set_yticklabels([])
+            if i < nrow - 1:
+                ax.set_xticklabels([])
+            if j == 0:
+                ax.set_ylabel('Unit %s' % ccg['keys'][i])
+            if i == 0:
+                ax.set_title('Unit %s' % ccg['keys'][j])
+
+    # plot isi histograms
+    if plot_isi is True:
+        isi = isi_counts(spiketrains, max_lag, bin_size)
+        for j in xrange(nu):
+            ax = fig.add_subplot(nrow, nu, nu * nu + j + 1)
+            ax.plot(isi['intervals'] / srate, isi['counts'][j],
+                    drawstyle='steps-mid', c=col_lst[j % len(col_lst)])
+            ax.set_xlim(0, isi['intervals'][-1] / srate)
+            ax.set_yticklabels([])
+            if j == 0:
+                ax.set_ylabel('ISI')
+
+    # fancy stuff
+    if title is not None:
+        fig.suptitle(title)
+
+    # produce plots
+    if filename is not None:
+        save_figure(fig, filename, '')
+    if show is True:
+        plt.show()
+    return fig
+
+##---MAIN
+
+if __name__ == '__main__':
+    pass
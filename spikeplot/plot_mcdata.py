@@ -8,35 +8,337 @@
 
 """scatter plot for clustering data"""
 __docformat__ = "restructuredtext"
-__all__ = ["mcdata"]
+__all__ = ["mcdata", "mcdata_pyramid"]
 
 ## IMPORTS
 
 import scipy as sp
-from .common import COLOURS, save_figure, check_plotting_handle, plt, mpl
+from numpy.lib.format import open_memmap
+from .common import (COLOURS, CHUNK_SIZE, save_figure, check_plotting_handle,
+                     plt, mpl)
+
+## CONSTANTS
+
+PYRAMID_BASE = 6
+"""log2 of the block size of the finest level of the min/max pyramid"""
+PYRAMID_SUFFIX = '.minmax.npy'
+"""suffix of the min/max pyramid file next to the recording"""
+STACK_SPREAD = 8.0
+"""default offset of stacked channels in robust standard deviations"""
 
 ## FUNCTIONS
 
+def _block_minmax(mins, maxs, block):
+    """reduce minima and maxima in blocks of rows
+
+    :type mins: ndarray
+    :param mins: The minima as (n, nc).
+    :type maxs: ndarray
+    :param maxs: The maxima as (n, nc).
+    :type block: int
+    :param block: The number of rows per block, the last block may be
+        shorter.
+    :returns: tuple - (mins, maxs) per block, each as (nblocks, nc).
+    """
+
+    n, nc = mins.shape
+    nfull = n // block
+    nblocks = -(-n // block)
+    rval = []
+    for arr, func in [(mins, sp.minimum), (maxs, sp.maximum)]:
+        red = sp.empty((nblocks, nc), dtype=arr.dtype)
+        red[:nfull] = func.reduce(
+            arr[:nfull * block].reshape(nfull, block, nc), axis=1)
+        if nblocks > nfull:
+            red[-1] = func.reduce(arr[nfull * block:], axis=0)
+        rval.append(red)
+    return tuple(rval)
+
+
+def _minmax_envelope(data, ncols):
+    """reduce multichanneled data to its min/max envelope
+
+    The samples are grouped into blocks so there are at most `ncols` blocks,
+    each block is reduced to its minimum and maximum with one reshape-reduce
+    over all channels. Drawn as a line, the envelope alternates between the
+    minimum and maximum at the block center and so covers the same pixels as
+    the full data.
+
+    :type data: ndarray
+    :param data: The data with samples on the rows and channels on the
+        columns.
+    :type ncols: int
+    :param ncols: The maximal number of blocks, usually the pixel width of
+        the axes.
+    :returns: tuple - (x, env) with the sample position per row of `env`
+        relative to the first sample, and the envelope as (2 * nblocks, nc)
+        in the dtype of `data`. If no reduction is necessary, the data is
+        returned as it is.
+    """
+
+    ns, nc = data.shape
+    block = int(sp.ceil(ns / float(max(ncols, 1))))
+    if block < 3:
+        return sp.arange(ns), data
+    mins, maxs = _block_minmax(data, data, block)
+    starts = sp.arange(0, ns, block)
+    centers = (starts + sp.minimum(starts + block, ns) - 1) / 2.0
+    return (sp.repeat(centers, 2),
+            sp.hstack((mins, maxs)).reshape(2 * mins.shape[0], nc))
+
+
+def _open_recording(path, nchan, dtype):
+    """open a raw binary recording with interleaved channels as memmap
+
+    :type path: str
+    :param path: Path to the recording file.
+    :type nchan: int
+    :param nchan: The number of channels.
+    :type dtype: dtype
+    :param dtype: The sample dtype of the file.
+    :returns: memmap - The recording as (ns, nchan), nothing is read yet.
+    """
+
+    if nchan is None:
+        raise ValueError('nchan is required for a recording file!')
+    return sp.memmap(path, dtype=dtype, mode='r').reshape(-1, nchan)
+
+
+def _pyramid_levels(ns):
+    """layout of the min/max pyramid of a recording
+
+    :type ns: int
+    :param ns: The sample count of the recording.
+    :returns: list - (block, offset, nblocks) per level from the finest to
+        the coarsest level, with the block size in samples, the first row of
+        the level in the pyramid and its number of rows.
+    """
+
+    rval = []
+    block = 2 ** PYRAMID_BASE
+    offset = 0
+    while True:
+        nblocks = -(-ns // block)
+        rval.append((block, offset, nblocks))
+        offset += nblocks
+        if nblocks <= 1:
+            return rval
+        block *= 2
+
+
+def mcdata_pyramid(path, nchan, dtype='int16'):
+    """build the min/max pyramid of a raw binary recording
+
+    The pyramid holds the minimum and maximum per channel for blocks of
+    2 ** PYRAMID_BASE samples, and for every power of two block size above,
+    up to one block for the whole recording. It is built in one streaming
+    pass over the recording and saved next to it (with PYRAMID_SUFFIX) as
+    .npy file in the dtype of the recording, about 1/16 of its size. `mcdata`
+    serves windows of any length from it when called with pyramid=True.
+
+    :type path: str
+    :param path: Path to the recording file.
+    :type nchan: int
+    :param nchan: The channel count of the recording file.
+    :type dtype: dtype
+    :param dtype: The sample dtype of the recording file.
+        Default='int16'
+    :returns: str - The path of the pyramid file.
+    """
+
+    # init
+    rec = _open_recording(path, nchan, dtype)
+    levels = _pyramid_levels(rec.shape[0])
+    pyr_path = path + PYRAMID_SUFFIX
+    pyr = open_memmap(pyr_path, mode='w+', dtype=rec.dtype,
+                      shape=(levels[-1][1] + levels[-1][2], 2, nchan))
+
+    # finest level in one pass over the recording
+    block, offset, _ = levels[0]
+    step = block * int(sp.ceil(CHUNK_SIZE / float(block)))
+    for start in xrange(0, rec.shape[0], step):
+        chunk = sp.asarray(rec[start:start + step])
+        mins, maxs = _block_minmax(chunk, chunk, block)
+        first = offset + start // block
+        pyr[first:first + mins.shape[0], 0] = mins
+        pyr[first:first + mins.shape[0], 1] = maxs
+
+    # coarser levels from the next finer level
+    for (_, fine_offset, fine_n), (_, offset, _) in zip(levels[:-1],
+                                                        levels[1:]):
+        for start in xrange(0, fine_n, 2 * CHUNK_SIZE):
+            fine = sp.asarray(pyr[fine_offset + start:
+                                  fine_offset + min(start + 2 * CHUNK_SIZE,
+                                                    fine_n)])
+            mins, maxs = _block_minmax(fine[:, 0], fine[:, 1], 2)
+            first = offset + start // 2
+            pyr[first:first + mins.shape[0], 0] = mins
+            pyr[first:first + mins.shape[0], 1] = maxs
+
+    # return
+    pyr.flush()
+    del pyr
+    return pyr_path
+
+
+def _pyramid_envelope(pyr, ns, lo, hi, ncols):
+    """min/max envelope of a recording window served from its pyramid
+
+    The coarsest level with at least `ncols` blocks in the window is read,
+    that is less than 2 * `ncols` blocks, so the cost only depends on
+    `ncols`.
+
+    :type pyr: ndarray
+    :param pyr: The pyramid as built by `mcdata_pyramid`.
+    :type ns: int
+    :param ns: The sample count of the recording.
+    :type lo: int
+    :param lo: The first sample of the window.
+    :type hi: int
+    :param hi: The sample after the last sample of the window.
+    :type ncols: int
+    :param ncols: The maximal number of blocks, usually the pixel width of
+        the axes.
+    :returns: tuple - (x, env, bounds) with `x` and `env` as for
+        `_minmax_envelope` and the first sample of each block relative to
+        `lo`, to reduce other data of the window alike. None if the window
+        is too short for the finest level.
+    """
+
+    levels = _pyramid_levels(ns)
+    if pyr.shape[0] != levels[-1][1] + levels[-1][2]:
+        raise ValueError('pyramid does not match the recording!')
+    levels = [lv for lv in levels if lv[0] * ncols <= hi - lo]
+    if len(levels) == 0:
+        return None
+    block, offset, _ = levels[-1]
+    first, last = lo // block, -(-hi // block)
+    sel = sp.asarray(pyr[offset + first:offset + last])
+    starts = sp.arange(first, last) * block
+    centers = (sp.maximum(starts, lo) +
+               sp.minimum(starts + block, hi) - 1) / 2.0 - lo
+    return (sp.repeat(centers, 2),
+            sel.reshape(2 * sel.shape[0], pyr.shape[2]),
+            sp.maximum(starts, lo) - lo)
+
+
+def _bounds_envelope(data, bounds):
+    """min/max envelope of multichanneled data for given blocks
+
+    :type data: ndarray
+    :param data: The data with samples on the rows and channels on the
+        columns.
+    :type bounds: ndarray
+    :param bounds: The first sample of each block, strictly increasing and
+        starting at 0.
+    :returns: ndarray - The envelope as (2 * nblocks, nc), as for
+        `_minmax_envelope`.
+    """
+
+    mins = sp.minimum.reduceat(data, bounds, axis=0)
+    maxs = sp.maximum.reduceat(data, bounds, axis=0)
+    return sp.hstack((mins, maxs)).reshape(2 * bounds.size, data.shape[1])
+
+
+def _event_lines(ax, times, x_lim, col):
+    """mark events on an axis with one collection of vertical lines
+
+    :type ax: matplotlib.axis
+    :param ax: The axis to plot on.
+    :type times: ndarray
+    :param times: The event samples.
+    :type x_lim: tuple
+    :param x_lim: The visible window, events outside are not drawn.
+    :type col: object
+    :param col: The colour of the lines.
+    """
+
+    times = sp.asarray(times, dtype=float)
+    times = times[(times >= x_lim[0]) & (times <= x_lim[1])]
+    segs = sp.zeros((times.size, 2, 2))
+    segs[:, :, 0] = times[:, None]
+    segs[:, 1, 1] = 1.0
+    ax.add_collection(
+        mpl.collections.LineCollection(
+            segs, colors=[col], transform=ax.get_xaxis_transform()),
+        autolim=False)
+
+
+def _epoch_spans(ax, epochs, x_lim, col):
+    """mark epochs on an axis with one collection of spans
+
+    :type ax: matplotlib.axis
+    :param ax: The axis to plot on.
+    :type epochs: ndarray
+    :param epochs: The epochs as [[start,stop]].
+    :type x_lim: tuple
+    :param x_lim: The visible window, epochs are clipped to it.
+    :type col: object
+    :param col: The colour of the spans.
+    """
+
+    epochs = sp.asarray(epochs, dtype=float).reshape(-1, 2)
+    epochs = epochs[(epochs[:, 1] >= x_lim[0]) & (epochs[:, 0] <= x_lim[1])]
+    start = sp.maximum(epochs[:, 0], x_lim[0])
+    stop = sp.minimum(epochs[:, 1], x_lim[1])
+    verts = sp.zeros((epochs.shape[0], 4, 2))
+    verts[:, :2, 0] = start[:, None]
+    verts[:, 2:, 0] = stop[:, None]
+    verts[:, 1:3, 1] = 1.0
+    ax.add_collection(
+        mpl.collections.PolyCollection(
+            verts, facecolors=[col], edgecolors='none', alpha=0.2,
+            transform=ax.get_xaxis_transform()),
+        autolim=False)
+
+
+def _stack_offset(data):
+    """offset between stacked channels from robust scale estimates
+
+    The standard deviation of each channel is estimated from its median
+    absolute deviation, the offset is STACK_SPREAD times the median over the
+    channels, so single noisy or dead channels do not change the layout.
+
+    :type data: ndarray
+    :param data: The data with samples on the rows and channels on the
+        columns.
+    :returns: float - The offset between neighbouring channels.
+    """
+
+    mad = sp.median(sp.absolute(data - sp.median(data, axis=0)), axis=0)
+    rval = STACK_SPREAD * sp.median(mad) / 0.6745
+    if not rval > 0:
+        rval = 1.0
+    return float(rval)
+
+
 def mcdata(data, other=None, x_offset=0, div=2, zero_line=True, events=None,
            epochs=None, plot_handle=None, colours=None, title=None,
-           filename=None, show=True):
+           filename=None, show=True, decimate=False, nchan=None,
+           dtype='int16', gain=1.0, n_samples=None, pyramid=False,
+           stacked=False, stack_offset=None):
     """plot multichanneled data
 
     -> general plot parameter
 
-    :type data: ndarray
+    :type data: ndarray or str
     :param data: The base data to plot with observations(samples) on the rows
         and variables(channels) on the columns. This data will be plotted on in
-        the n topmost axes.
+        the n topmost axes. If a str, the path of a raw binary recording with
+        interleaved channels (see `nchan`, `dtype`, `gain`), that is opened as
+        memmap. Only the samples in the window starting at `x_offset` are read.
     :type other: ndarray
     :param other: Other data that augments the base data. The other data will
-        be plotted in one axe visibly divided from the base data.
+        be plotted in one axe visibly divided from the base data. For a
+        recording file it has to cover the plotted window only, it is not
+        windowed by `x_offset`.
         Default=None
     :type x_offset: int
     :param x_offset: A offset value for the x-axis(samples). This allows for
         the x-axis to show proper values for windows not starting at x=0. All
         values for events and epochs etc. will not be shown if they do not
-        fall into the frame defined.
+        fall into the frame defined. For a recording file this is the offset
+        of the window in the file.
         Default=0
     :type div: float
     :param div: Percentage of the figure height to use as divider for the
@@ -58,15 +360,73 @@ def mcdata(data, other=None, x_offset=0, div=2, zero_line=True, events=None,
         with numeric keys will be interpreted as belonging to the unit with
         that key and will be coloured according to the '' vector. All other
         epochs will appear in grey colour. Epochs are passed as a 2dim vector,
-        like [[start,stop]].
+        like [[start,stop]]. If not a dict, all epochs appear in grey colour.
         Default={}
+    :type decimate: bool
+    :param decimate: If True, reduce the data (and the other data) to its
+        min/max envelope per pixel column of the axes before plotting, so the
+        cost is bounded by the figure width instead of the data length. The
+        plot looks the same as the full resolution plot.
+        Default=False
+    :type nchan: int
+    :param nchan: The channel count of the recording file.
+        Default=None
+    :type dtype: dtype
+    :param dtype: The sample dtype of the recording file.
+        Default='int16'
+    :type gain: float
+    :param gain: Scale factor applied to the samples of the recording file,
+        the window is converted to float32.
+        Default=1.0
+    :type n_samples: int
+    :param n_samples: The window length in samples. If None, all samples from
+        `x_offset` on are plotted. For in-memory data, `other` is cut to the
+        same length.
+        Default=None
+    :type pyramid: bool
+    :param pyramid: If True, serve the window of the recording file from its
+        min/max pyramid as built by `mcdata_pyramid`, this implies
+        `decimate`. Windows too short for the finest pyramid level are
+        decimated from the samples.
+        Default=False
+    :type stacked: bool
+    :param stacked: If True, plot all channels in one axe with a vertical
+        offset per channel and the channel labels as ticks, instead of one axe
+        per channel. This scales to high channel counts.
+        Default=False
+    :type stack_offset: float
+    :param stack_offset: The offset between neighbouring channels for the
+        stacked layout. If None, it is estimated from the median absolute
+        deviation of the channels.
+        Default=None
     """
 
     # checks
+    scale = None
+    path = None
+    if isinstance(data, basestring):
+        if x_offset < 0:
+            raise ValueError('x_offset is negative for a recording file!')
+        path = data
+        data = _open_recording(path, nchan, dtype)
+        rec_ns = data.shape[0]
+        stop = None
+        if n_samples is not None:
+            stop = x_offset + n_samples
+        data = data[x_offset:stop]
+        scale = gain
+    elif n_samples is not None:
+        data = data[:n_samples]
+        if other is not None:
+            other = other[:n_samples]
+    if pyramid is True and path is None:
+        raise ValueError('pyramid requires a recording file!')
     if not isinstance(data, sp.ndarray):
         raise ValueError("data is no ndarray!")
     if data.ndim != 2:
         raise ValueError("data is not dim=2!")
+    if other is not None and other.shape[0] != data.shape[0]:
+        raise ValueError("other does not match the length of data!")
     fig, ax = check_plotting_handle(plot_handle, create_ax=False)
 
     # init
@@ -74,6 +434,28 @@ def mcdata(data, other=None, x_offset=0, div=2, zero_line=True, events=None,
     has_other = other is not None
     ns, nc = data.shape
     x_vals = sp.arange(ns) + x_offset
+    x_lim = (x_offset, x_offset + ns - 1)
+    if decimate is True or pyramid is True:
+        ncols = int(fig.get_figwidth() * fig.dpi * 0.8)
+        bounds = None
+        if pyramid is True:
+            env = _pyramid_envelope(
+                sp.load(path + PYRAMID_SUFFIX, mmap_mode='r'), rec_ns,
+                x_offset, x_offset + ns, ncols)
+            if env is not None:
+                x_idx, data, bounds = env
+        if bounds is None:
+            x_idx, data = _minmax_envelope(data, ncols)
+        x_vals = x_idx + x_offset
+        if has_other:
+            # reduce the other data to the same blocks as the data
+            if bounds is None:
+                other = _minmax_envelope(other, ncols)[1]
+            else:
+                other = _bounds_envelope(other, bounds)
+    if scale is not None:
+        # scale the window (or its envelope) only, as float32
+        data = data.astype(sp.float32) * sp.float32(scale)
     if colours is None:
         col_lst = COLOURS
     elif colours == 'black':
@@ -81,22 +463,42 @@ def mcdata(data, other=None, x_offset=0, div=2, zero_line=True, events=None,
     else:
         col_lst = colours
     ax_spacer = div * 0.01
+    y_offsets = sp.zeros(nc)
+    if stacked is True:
+        if stack_offset is None:
+            stack_offset = _stack_offset(data)
+        y_offsets = -stack_offset * sp.arange(nc)
 
     # prepare axes
     if has_other:
         ax_height = (0.8 - (nc + 1) * ax_spacer) / (nc + 1)
     else:
         ax_height = (0.8 - (nc - 1) * ax_spacer) / nc
-    for c in xrange(nc):
-        ax_size = (
-            0.1, 0.9 - (c + 1) * ax_height - c * ax_spacer, 0.8, ax_height)
-        ax = fig.add_axes(ax_size, sharex=ax, sharey=ax)
-        ax.set_ylabel('CH %d' % c)
-        if c != nc - 1:
+    if stacked is True:
+        # one axe for all channels, the other data gets a fixed share
+        if has_other:
+            ax_height = 0.15
+            ax = fig.add_axes((0.1, 0.1 + ax_height + ax_spacer, 0.8,
+                               0.8 - ax_height - ax_spacer))
             plt.setp(ax.get_xticklabels(), visible=False)
-            #ax.set_xticklabels([tl.get_text() for tl in ax.get_xticklabels()], visible=False)
-            #ax.set_xlim(x_vals[0], x_vals[-1])
-            #ax.set_ylim(data.min() * 1.1, data.max() * 1.1)
+        else:
+            ax = fig.add_axes((0.1, 0.1, 0.8, 0.8))
+        ax.set_yticks(y_offsets)
+        ax.set_yticklabels(['CH %d' % c for c in xrange(nc)])
+        data_axes = [ax]
+    else:
+        for c in xrange(nc):
+            ax_size = (
+                0.1, 0.9 - (c + 1) * ax_height - c * ax_spacer, 0.8,
+                ax_height)
+            ax = fig.add_axes(ax_size, sharex=ax, sharey=ax)
+            ax.set_ylabel('CH %d' % c)
+            if c != nc - 1:
+                plt.setp(ax.get_xticklabels(), visible=False)
+                #ax.set_xticklabels([tl.get_text() for tl in ax.get_xticklabels()], visible=False)
+                #ax.set_xlim(x_vals[0], x_vals[-1])
+                #ax.set_ylim(data.min() * 1.1, data.max() * 1.1)
+        data_axes = fig.axes[:nc]
     if has_other:
         ax = fig.add_axes((0.1, 0.1, 0.8, ax_height), sharex=ax)
         ax.set_ylabel('OTHER')
@@ -104,10 +506,18 @@ def mcdata(data, other=None, x_offset=0, div=2, zero_line=True, events=None,
         #ax.set_ylim(-other.max() * 1.1, other.max() * 1.1)
 
     # plot data
-    for c, a in enumerate(fig.axes[:nc]):
-        a.add_collection(
-            mpl.collections.LineCollection(
-                [sp.vstack((x_vals, data[:, c])).T], colors=[(0, 0, 0)]))
+    if stacked is True:
+        # all channels as one (nc, ns, 2) segment array
+        segs = sp.empty((nc, x_vals.size, 2))
+        segs[..., 0] = x_vals
+        segs[..., 1] = data.T + y_offsets[:, None]
+        data_axes[0].add_collection(
+            mpl.collections.LineCollection(segs, colors=[(0, 0, 0)]))
+    else:
+        for c, a in enumerate(data_axes):
+            a.add_collection(
+                mpl.collections.LineCollection(
+                    [sp.vstack((x_vals, data[:, c])).T], colors=[(0, 0, 0)]))
 
     # plot other
     if has_other:
@@ -131,45 +541,70 @@ def mcdata(data, other=None, x_offset=0, div=2, zero_line=True, events=None,
                     raise ValueError('Waveform for unit %s has mismatching '
                                      'channel count' % u)
                 cut = int(sp.floor(u_wf.shape[0] / 2.0))
-                for c, a in enumerate(fig.axes[:nc]):
-                    a.add_collection(
+                wf_x = sp.arange(u_wf.shape[0]) - cut
+                # cull events without samples in the window
+                u_ev = sp.asarray(u_ev)
+                u_ev = u_ev[(u_ev + wf_x[-1] >= x_lim[0]) &
+                            (u_ev + wf_x[0] <= x_lim[1])]
+                wf_x = u_ev[:, None] + wf_x
+                if stacked is True:
+                    # all channels as one (nc * n_events, n_samples, 2) array
+                    segs = sp.empty((nc,) + wf_x.shape + (2,))
+                    segs[..., 0] = wf_x
+                    segs[..., 1] = (u_wf.T + y_offsets[:, None])[:, None, :]
+                    data_axes[0].add_collection(
                         mpl.collections.LineCollection(
-                            [sp.vstack((sp.arange(u_wf.shape[0]) - cut + u_ev[i],
-                                        u_wf[:, c])).T
-                             for i in xrange(u_ev.size)], colors=[col]))
+                            segs.reshape(-1, wf_x.shape[1], 2),
+                            colors=[col]))
+                else:
+                    for c, a in enumerate(data_axes):
+                        # one (n_events, n_samples, 2) array per channel, the
+                        # collection keeps views on it
+                        segs = sp.empty(wf_x.shape + (2,))
+                        segs[..., 0] = wf_x
+                        segs[..., 1] = u_wf[:, c]
+                        a.add_collection(
+                            mpl.collections.LineCollection(segs,
+                                                           colors=[col]))
                 if has_other:
-                    for e in u_ev:
-                        fig.axes[-1].axvline(e, c=col)
+                    _event_lines(fig.axes[-1], u_ev, x_lim, col)
             elif isinstance(events[u], (list, sp.ndarray)):
                 for a in fig.axes:
-                    for e in events[u]:
-                        a.axvline(e, c=col)
+                    _event_lines(a, events[u], x_lim, col)
             else:
                 raise ValueError('events for unit %s are messed up' % u)
 
     # plot epochs
     if epochs is not None:
+        if not isinstance(epochs, dict):
+            epochs = {'0':epochs}
         for u in sorted(epochs):
             try:
                 col = col_lst[u % len(col_lst)]
             except:
                 col = 'gray'
-            for ep in epochs[u]:
-                for a in fig.axes:
-                    a.axvspan(ep[0], ep[1], fc=col, alpha=0.2)
+            for a in fig.axes:
+                _epoch_spans(a, epochs[u], x_lim, col)
 
     # zero lines
     if zero_line:
         for a in fig.axes:
+            levels = [0.0]
+            if a is data_axes[0]:
+                levels = sp.unique(y_offsets)
             a.add_collection(
                 mpl.collections.LineCollection(
-                    [sp.vstack(([x_vals[0], x_vals[-1]], sp.zeros(2))).T],
+                    [sp.vstack((x_lim, [y, y])).T for y in levels],
                     linestyles='dashed',
                     colors=[(0, 0, 0)]))
 
     # scale axes
-    fig.axes[0].set_xlim(x_vals[0], x_vals[-1])
-    fig.axes[0].set_ylim(sp.nanmin(data) * 1.05, sp.nanmax(data) * 1.05)
+    fig.axes[0].set_xlim(*x_lim)
+    if stacked is True:
+        fig.axes[0].set_ylim(y_offsets[-1] - 0.5 * stack_offset,
+                             0.5 * stack_offset)
+    else:
+        fig.axes[0].set_ylim(sp.nanmin(data) * 1.05, sp.nanmax(data) * 1.05)
     if has_other:
         fig.axes[-1].set_ylim(sp.nanmin(other) * 1.1, sp.nanmax(other) * 1.1)
 
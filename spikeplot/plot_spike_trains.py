@@ -8,21 +8,363 @@
 
 """scatter plot for clustering data"""
 __docformat__ = 'restructuredtext'
-__all__ = ['spike_trains']
+__all__ = ['spike_trains', 'spike_train_alignment']
 
 
 ##---IMPORTS
 
 import scipy as sp
-from .common import COLOURS, save_figure, check_plotting_handle, plt
+from scipy.ndimage import gaussian_filter1d
+from .common import (COLOURS, CHUNK_SIZE, save_figure, check_plotting_handle,
+                     plt, mpl)
+
+
+##---CONSTANTS
+
+LABELS = ['TP', 'TPO', 'FP', 'FPA', 'FPAO', 'FN', 'FNO']
+"""spike label categories, the label values index into this list from 1"""
 
 
 ##---FUNCTION
 
+def _raster_segments(trains, rows, col_lst, srate=1.0, height=0.4):
+    """build the vertical tick segments and colours for a spike raster
+
+    The segments of all units are written block-wise into one preallocated
+    array, so no per-spike temporaries are created.
+
+    :Parameters:
+        trains : list
+            List of 1d ndarray, holding the spike times per row.
+        rows : ndarray
+            The y-position per row.
+        col_lst : list
+            List of colours per row in any matplotlib conform colour
+            representation.
+        srate : float
+            Scale factor for the time axis.
+        height : float
+            Half height of the ticks.
+    :Returns:
+        ndarray
+            The segments as (nspikes, 2, 2).
+        ndarray
+            The RGBA colours as (nspikes, 4).
+    """
+
+    bounds = sp.concatenate(([0], sp.cumsum([t.size for t in trains])))
+    segs = sp.empty((bounds[-1], 2, 2))
+    cols = sp.empty((bounds[-1], 4))
+    for i, t in enumerate(trains):
+        start, stop = bounds[i], bounds[i + 1]
+        segs[start:stop, :, 0] = (t / srate)[:, None]
+        segs[start:stop, 0, 1] = rows[i] - height
+        segs[start:stop, 1, 1] = rows[i] + height
+        cols[start:stop] = mpl.colors.colorConverter.to_rgba(col_lst[i])
+    return segs, cols
+
+
+def _alignment_segments(train1, train2, align, row1, row2, srate=1.0,
+                        win1=None, win2=None):
+    """build the connecting segments for the aligned spikes of two units
+
+    :Parameters:
+        train1 : ndarray
+            The spike times of the first unit.
+        train2 : ndarray
+            The spike times of the second unit.
+        align : ndarray or list
+            The alignment as (k, 2) integer array or list of (idx1, idx2)
+            tuples, holding the indices of aligned spikes into `train1` and
+            `train2`.
+        row1 : float
+            The y-position of the first unit.
+        row2 : float
+            The y-position of the second unit.
+        srate : float
+            Scale factor for the time axis.
+        win1 : tuple
+            If not None, the (start, stop) index range of the visible spikes
+            of `train1`. Pairs with neither spike visible are dropped.
+        win2 : tuple
+            The (start, stop) index range of the visible spikes of `train2`.
+    :Returns:
+        ndarray
+            The segments as (k, 2, 2).
+    """
+
+    align = sp.asarray(align, dtype=int).reshape(-1, 2)
+    if win1 is not None and win2 is not None:
+        align = align[((align[:, 0] >= win1[0]) & (align[:, 0] < win1[1])) |
+                      ((align[:, 1] >= win2[0]) & (align[:, 1] < win2[1]))]
+    rval = sp.empty((align.shape[0], 2, 2))
+    rval[:, 0, 0] = train1[align[:, 0]] / srate
+    rval[:, 1, 0] = train2[align[:, 1]] / srate
+    rval[:, 0, 1] = row1
+    rval[:, 1, 1] = row2
+    return rval
+
+
+def _binned_rates(trains, t_lo, bin_width, nbins):
+    """bin the spike trains into firing rates
+
+    Each train is binned with a single bincount on the integer bin indices,
+    memory is bounded by the number of bins.
+
+    :Parameters:
+        trains : list
+            List of 1d ndarray, holding the spike times per row.
+        t_lo : float
+            The start time of the first bin.
+        bin_width : float
+            The bin width in units of the spike times.
+        nbins : int
+            Number of bins.
+    :Returns:
+        ndarray
+            The spike counts per bin as (len(trains), nbins).
+    """
+
+    rval = sp.zeros((len(trains), nbins))
+    for i, t in enumerate(trains):
+        if t.size == 0:
+            continue
+        idx = ((t - t_lo) / bin_width).astype(int)
+        sp.clip(idx, 0, nbins - 1, out=idx)
+        rval[i] = sp.bincount(idx, minlength=nbins)
+    return rval
+
+
+def _merge_trains(trains):
+    """merge spike trains into one sorted train
+
+    :Parameters:
+        trains : list
+            List of 1d ndarray, holding the spike times.
+    :Returns:
+        ndarray
+            The merged, sorted spike times.
+        ndarray
+            The index into `trains` per merged spike.
+        ndarray
+            The index into its own train per merged spike.
+        ndarray
+            The position in the merged train for the concatenation of
+            `trains`, to map flags of the merged train back.
+    """
+
+    times = sp.concatenate([sp.asarray(t, dtype=float) for t in trains])
+    units = sp.repeat(sp.arange(len(trains)), [len(t) for t in trains])
+    local = sp.concatenate([sp.arange(len(t)) for t in trains])
+    order = sp.argsort(times, kind='mergesort')
+    position = sp.empty_like(order)
+    position[order] = sp.arange(order.size)
+    return times[order], units[order], local[order], position
+
+
+def _overlap_flags(times, window):
+    """flag the spikes of a sorted train that have a neighbour within
+    `window`"""
+
+    rval = sp.zeros(times.size, dtype=bool)
+    close = sp.diff(times) <= window
+    rval[:-1] |= close
+    rval[1:] |= close
+    return rval
+
+
+def _match_groups(ai, bi, dist, group, na, nb):
+    """optimal one-to-one matchings of groups of conflicting candidates
+
+    Matchings of spikes on a line never have to cross, so the matching with
+    the most pairs and, among those, the smallest summed distance is found
+    per group by dynamic programming over both sorted sets of spikes. Groups
+    of similar size are padded to a common size and solved together.
+
+    :Parameters:
+        ai : ndarray
+            The rank of the first spike per candidate within its group.
+        bi : ndarray
+            The rank of the second spike per candidate within its group.
+        dist : ndarray
+            The distance per candidate.
+        group : ndarray
+            The group per candidate, the candidates are sorted by group.
+        na : ndarray
+            The number of first spikes per group.
+        nb : ndarray
+            The number of second spikes per group.
+    :Returns:
+        ndarray
+            Boolean mask of the matched candidates.
+    """
+
+    rval = sp.zeros(ai.size, dtype=bool)
+    first = sp.concatenate(([0], sp.cumsum(sp.bincount(group))))
+    pad_a = 2 ** sp.ceil(sp.log2(na)).astype(int)
+    pad_b = 2 ** sp.ceil(sp.log2(nb)).astype(int)
+    for size_a, size_b in set(zip(pad_a, pad_b)):
+        groups = sp.nonzero((pad_a == size_a) & (pad_b == size_b))[0]
+        step = max(1, CHUNK_SIZE * 100 // ((size_a + 1) * (size_b + 1)))
+        for start in xrange(0, groups.size, step):
+            grp = groups[start:start + step]
+            ng = first[grp + 1] - first[grp]
+            idx = (sp.repeat(first[grp] - (sp.cumsum(ng) - ng), ng) +
+                   sp.arange(ng.sum()))
+            g, i_e, k_e = sp.repeat(sp.arange(grp.size), ng), ai[idx], bi[idx]
+            # one match outweighs any summed distance of the group
+            gain = (sp.bincount(g, weights=dist[idx]) + 1.0)[g] - dist[idx]
+            edge = sp.zeros((grp.size, size_a, size_b), dtype=int) - 1
+            edge[g, i_e, k_e] = idx
+            score = sp.zeros((grp.size, size_a + 1, size_b + 1))
+            for i in xrange(size_a):
+                row = score[:, i].copy()
+                e = i_e == i
+                row[g[e], k_e[e] + 1] = sp.maximum(
+                    row[g[e], k_e[e] + 1],
+                    score[g[e], i, k_e[e]] + gain[e])
+                score[:, i + 1] = sp.maximum.accumulate(row, axis=1)
+
+            # trace back all groups at once
+            gg = sp.arange(grp.size)
+            i, k = na[grp].copy(), nb[grp].copy()
+            active = (i > 0) & (k > 0)
+            while active.any():
+                cur = score[gg, i, k]
+                up = active & (cur == score[gg, i - 1, k])
+                left = active & ~up & (cur == score[gg, i, k - 1])
+                diag = active & ~up & ~left
+                rval[edge[gg[diag], i[diag] - 1, k[diag] - 1]] = True
+                i -= up | diag
+                k -= left | diag
+                active = (i > 0) & (k > 0)
+    return rval
+
+
+def spike_train_alignment(spiketrains, spiketrains2, jitter, overlap=None):
+    """match two sets of spike trains and label the spikes
+
+    All units are matched at once by a sorted sweep: both sets are merged
+    into one sorted train each, the candidate partners of every spike of the
+    first set within `jitter` are found with searchsorted. Per unit pair,
+    the candidates split into small groups of conflicting candidates, each
+    is resolved to the one-to-one matching with the most pairs and, among
+    those, the smallest summed distance. Each unit of the second set is then
+    assigned to the unit of the first set it shares the most matches with
+    (greedily, one-to-one). The first set is regarded as the ground truth.
+
+    :Parameters:
+        spiketrains : dict
+            Dict of 1d ndarray, holding the sorted spike times of set 1.
+        spiketrains2 : dict
+            Dict of 1d ndarray, holding the sorted spike times of set 2.
+        jitter : float
+            Maximal time difference of matching spikes.
+        overlap : float
+            If not None, spikes with another spike of the same set within this
+            time are labeled as overlaps (TPO, FPAO, FNO).
+            Default=None
+    :Returns:
+        dict
+            The alignment as expected by `spike_trains`, with the unit pairs
+            as keys and the indices of matched spikes as (k, 2) ndarray.
+        dict
+            The labels for set 1 (TP, TPO, FN, FNO), indexing into LABELS
+            from 1.
+        dict
+            The labels for set 2 (TP, TPO, FP, FPA, FPAO).
+    """
+
+    # merge both sets
+    keys1 = sorted(spiketrains.keys())
+    keys2 = sorted(spiketrains2.keys())
+    n1, n2 = len(keys1), len(keys2)
+    t1, u1, l1, pos1 = _merge_trains([spiketrains[k] for k in keys1])
+    t2, u2, l2, pos2 = _merge_trains([spiketrains2[k] for k in keys2])
+
+    # candidate pairs within jitter
+    lo = t2.searchsorted(t1 - jitter, 'left')
+    cnt = t2.searchsorted(t1 + jitter, 'right') - lo
+    a = sp.repeat(sp.arange(t1.size), cnt)
+    b = sp.repeat(lo - (sp.cumsum(cnt) - cnt), cnt) + sp.arange(cnt.sum())
+    d = sp.absolute(t2[b] - t1[a])
+
+    # group the candidates per unit pair in time order, within a unit pair
+    # the partners of a spike are a contiguous run of the other train, so a
+    # group of conflicting candidates ends where no later spike shares a
+    # partner with it
+    pair = u1[a] * n2 + u2[b]
+    order = sp.lexsort((b, a, pair))
+    a, b, d, pair = a[order], b[order], d[order], pair[order]
+    key = pair * t2.size + b
+    start = sp.ones(a.size, dtype=bool)
+    start[1:] = ((key[1:] > sp.maximum.accumulate(key)[:-1]) &
+                 ((a[1:] != a[:-1]) | (pair[1:] != pair[:-1])))
+    group = sp.cumsum(start) - 1
+
+    # one-to-one per unit pair: the spikes of a group are consecutive in
+    # their trains, so their ranks follow from the local indices
+    first = sp.nonzero(start)[0]
+    ai = l1[a] - sp.minimum.reduceat(l1[a], first)[group]
+    bi = l2[b] - sp.minimum.reduceat(l2[b], first)[group]
+    keep = _match_groups(ai, bi, d, group,
+                         sp.maximum.reduceat(ai, first) + 1,
+                         sp.maximum.reduceat(bi, first) + 1)
+    a, b = a[keep], b[keep]
+
+    # alignment per unit pair
+    pair = u1[a] * n2 + u2[b]
+    order = sp.argsort(pair, kind='mergesort')
+    bounds = sp.concatenate(
+        ([0], sp.cumsum(sp.bincount(pair, minlength=n1 * n2))))
+    alignment = {}
+    for p in sp.nonzero(bounds[1:] > bounds[:-1])[0]:
+        idx = order[bounds[p]:bounds[p + 1]]
+        alignment[(keys1[p // n2], keys2[p % n2])] = sp.vstack(
+            (l1[a[idx]], l2[b[idx]])).T
+
+    # greedy one-to-one unit assignment by match count
+    counts = (bounds[1:] - bounds[:-1]).reshape(n1, n2)
+    assign1 = sp.zeros(n1, dtype=int) - 1
+    assign2 = sp.zeros(n2, dtype=int) - 1
+    for p in sp.argsort(-counts, axis=None, kind='mergesort'):
+        i, j = p // n2, p % n2
+        if counts[i, j] == 0:
+            break
+        if assign1[i] < 0 and assign2[j] < 0:
+            assign1[i], assign2[j] = j, i
+
+    # labels
+    hit = u2[b] == assign1[u1[a]]
+    tp1 = sp.zeros(t1.size, dtype=bool)
+    tp1[a[hit]] = True
+    tp2 = sp.zeros(t2.size, dtype=bool)
+    tp2[b[hit]] = True
+    any2 = sp.zeros(t2.size, dtype=bool)
+    any2[b] = True
+    ov1 = sp.zeros(t1.size, dtype=bool)
+    ov2 = sp.zeros(t2.size, dtype=bool)
+    if overlap is not None:
+        ov1 = _overlap_flags(t1, overlap)
+        ov2 = _overlap_flags(t2, overlap)
+    lab1 = sp.where(tp1, 1, 6) + ov1
+    lab2 = sp.where(tp2, 1, sp.where(any2, 4, 3)) + (ov2 & (tp2 | any2))
+    lab1, lab2 = lab1[pos1], lab2[pos2]
+    bounds1 = sp.cumsum([0] + [len(spiketrains[k]) for k in keys1])
+    bounds2 = sp.cumsum([0] + [len(spiketrains2[k]) for k in keys2])
+    label1 = dict([(k, lab1[bounds1[i]:bounds1[i + 1]])
+                   for i, k in enumerate(keys1)])
+    label2 = dict([(k, lab2[bounds2[i]:bounds2[i + 1]])
+                   for i, k in enumerate(keys2)])
+    return alignment, label1, label2
+
+
 def spike_trains(spiketrains, spiketrains2=None, alignment=None,
                  marker_width=3, samples_per_second=None, plot_handle=None,
                  filename=None, label1=None, label2=None, colours=None,
-                 show=True):
+                 show=True, label_text_limit=100, t_start=None, t_stop=None,
+                 mode='raster', bin_size=1.0, smooth=None,
+                 rate_style='heatmap'):
     """plot one set of spike trains or two sets of spike trains with their
     inter-spike alignment
 
@@ -32,8 +374,11 @@ def spike_trains(spiketrains, spiketrains2=None, alignment=None,
         spiketrains2 : dict
             Dict of 1d ndarray, holding the spike times. If this is given an
             interspike assignment plot is created.
-        alignment : list
-            List of lists of tupels containing the pairwise spike alignments.
+        alignment : dict
+            Dict with the unit pairs (unit1, unit2) as keys, holding the
+            pairwise spike alignments as list of (idx1, idx2) tuples or as
+            (k, 2) integer ndarray of spike indices. Pairs without an entry
+            are skipped.
         marker_width : int
             Fancy parameter for the plot.
         samples_per_second : int
@@ -42,12 +387,43 @@ def spike_trains(spiketrains, spiketrains2=None, alignment=None,
             A reference to a figure or axis, or None if one has to be created.
         filename : str
             If given and a valid path on the local system, save the figure.
-        label1 : str
-            Label for interspike alignment set 1.
-        label2 : str
-            Label for interspike alignment set 2.
+        label1 : dict
+            Dict of 1d ndarray, holding the spike labels for set 1. The
+            labels index into ['TP', 'TPO', 'FP', 'FPA', 'FPAO', 'FN', 'FNO']
+            starting at 1, only labels from 3 ('FP') on are shown.
+        label2 : dict
+            Dict of 1d ndarray, holding the spike labels for set 2.
         show : bool
             If True, show the figure.
+        label_text_limit : int
+            If at most this many spikes are labeled, the labels are placed as
+            text, else one marker per label category is used with a legend.
+            Default=100
+        t_start : float
+            If not None, only show spikes from this time on, in units of the
+            time axis (seconds if samples_per_second is given, else samples).
+            The spike trains have to be sorted. Spikes, alignments and labels
+            outside the window are culled before plotting.
+            Default=None
+        t_stop : float
+            If not None, only show spikes up to this time.
+            Default=None
+        mode : str
+            'raster' plots every spike as a tick, 'rate' bins the spike
+            trains and plots the firing rate per unit. Alignment and labels
+            are not shown in 'rate' mode.
+            Default='raster'
+        bin_size : float
+            The bin size for mode='rate' in units of the time axis.
+            Default=1.0
+        smooth : float
+            If not None, the std of a gaussian kernel in units of the time
+            axis the rates are smoothed with.
+            Default=None
+        rate_style : str
+            'heatmap' shows the rates as one image, 'traces' as one trace per
+            unit, scaled to the height of its row.
+            Default='heatmap'
     :Returns:
         matplotlib.figure
             Reference th the figure ploted on
@@ -56,6 +432,10 @@ def spike_trains(spiketrains, spiketrains2=None, alignment=None,
     # checks
     if not len(spiketrains):
         raise Exception('Provide at least one spiketrain in set 1!')
+    if mode not in ['raster', 'rate']:
+        raise ValueError('unknown mode: %s' % mode)
+    if rate_style not in ['heatmap', 'traces']:
+        raise ValueError('unknown rate_style: %s' % rate_style)
 
     # colour list
     if colours is None:
@@ -76,107 +456,145 @@ def spike_trains(spiketrains, spiketrains2=None, alignment=None,
     if spiketrains2 is not None:
         nneuron += len(spiketrains2)
         offset = 1
-    labels = []
-    idx = 0
-
-    # plot the spike trains
-    my_max_timesample = 0
-    my_min_timesample = spiketrains[spiketrains.keys()[0]][0]
-    for unit in sorted(spiketrains.keys()):
-        col = col_lst[idx % len(col_lst)]
-        ax.plot(
-            spiketrains[unit] / srate,
-            sp.zeros_like(spiketrains[unit]) + nneuron - 1 - idx,
-            marker='|',
-            mec=col,
-            mfc=col,
-            mew=marker_width,
-            ls='None',
-            ms=13)
-        labels.append('Unit %s' % unit)
-        idx += 1
-        my_max_timesample = max(my_max_timesample, spiketrains[unit].max())
-        my_min_timesample = max(my_min_timesample, spiketrains[unit].min())
-
+    skeys1 = sorted(spiketrains.keys())
+    skeys2 = []
+    if spiketrains2 is not None:
+        skeys2 = sorted(spiketrains2.keys())
+    rows1 = nneuron - 1 - sp.arange(len(skeys1))
+    rows2 = nneuron - 1 - offset - len(skeys1) - sp.arange(len(skeys2))
+    labels = ['Unit %s' % unit for unit in skeys1]
     if spiketrains2 is not None:
         labels.append('')
-        ax.axhline(y=nneuron - 1 - idx, xmin=0, xmax=1)
-        for unit in sorted(spiketrains2.keys()):
-            col = col_lst[idx % len(col_lst)]
-            ax.plot(spiketrains2[unit] / srate, sp.zeros_like(
-                spiketrains2[unit]) + nneuron - 1 - idx - offset, marker='|',
-                    mec=col,
-                    mfc=col,
-                    mew=marker_width,
-                    ls='None',
-                    ms=13)
-            labels.append('Unit %s' % unit)
-            idx += 1
-            my_max_timesample = max(my_max_timesample,
-                                    spiketrains2[unit].max())
-            my_min_timesample = max(my_min_timesample,
-                                    spiketrains2[unit].min())
+        labels.extend(['Unit %s' % unit for unit in skeys2])
+
+    # cull the spikes outside of the time window
+    trains = [sp.asarray(spiketrains[unit]) for unit in skeys1]
+    if spiketrains2 is not None:
+        trains.extend([sp.asarray(spiketrains2[unit]) for unit in skeys2])
+    windows = None
+    trains_win = trains
+    if t_start is not None or t_stop is not None:
+        windows = [(0, t.size) for t in trains]
+        if t_start is not None:
+            windows = [(t.searchsorted(t_start * srate, 'left'), w[1])
+                       for t, w in zip(trains, windows)]
+        if t_stop is not None:
+            windows = [(w[0], t.searchsorted(t_stop * srate, 'right'))
+                       for t, w in zip(trains, windows)]
+        trains_win = [t[w[0]:w[1]] for t, w in zip(trains, windows)]
+
+    # plot the spike trains of both sets as one collection
+    if spiketrains2 is not None:
+        ax.axhline(y=nneuron - 1 - len(skeys1), xmin=0, xmax=1)
+    rows = sp.concatenate((rows1, rows2))
+    if mode == 'rate':
+        # bin all trains, in units of the spike times
+        nonempty = [t for t in trains_win if t.size > 0]
+        t_lo = min([t.min() for t in nonempty] or [0])
+        t_hi = max([t.max() for t in nonempty] or [0])
+        if t_start is not None:
+            t_lo = t_start * srate
+        if t_stop is not None:
+            t_hi = t_stop * srate
+        bin_width = bin_size * srate
+        nbins = max(int(sp.ceil((t_hi - t_lo) / bin_width)), 1)
+        rates = _binned_rates(trains_win, t_lo, bin_width, nbins) / bin_size
+        if smooth is not None:
+            rates = gaussian_filter1d(rates, smooth / float(bin_size),
+                                      axis=1)
+        if rate_style == 'heatmap':
+            img = sp.zeros((nneuron + offset, nbins)) + sp.nan
+            img[rows + offset] = rates
+            im = ax.imshow(img, origin='lower', aspect='auto',
+                           interpolation='nearest',
+                           extent=(t_lo / srate, t_lo / srate + nbins *
+                                   bin_size, -0.5 - offset, nneuron - 0.5))
+            fig.colorbar(im, ax=ax)
+        else:
+            scale = rates.max(axis=1)
+            scale[scale == 0] = 1.0
+            segs = sp.empty((len(trains_win), nbins, 2))
+            segs[..., 0] = t_lo / srate + (sp.arange(nbins) + 0.5) * bin_size
+            segs[..., 1] = (rows[:, None] - 0.4 +
+                            0.8 * rates / scale[:, None])
+            ax.add_collection(
+                mpl.collections.LineCollection(
+                    segs,
+                    colors=[col_lst[i % len(col_lst)]
+                            for i in xrange(nneuron)]))
+            ax.autoscale_view()
+    else:
+        segs, cols = _raster_segments(
+            trains_win, rows,
+            [col_lst[i % len(col_lst)] for i in xrange(nneuron)], srate)
+        ax.add_collection(
+            mpl.collections.LineCollection(segs, colors=cols,
+                                           linewidths=marker_width))
+        ax.autoscale_view()
 
     # plot alignment if provided
-    if alignment is not None:
+    if alignment is not None and mode == 'raster':
+        # pairs as (idx1, idx2, index of the second unit in trains, row2)
         if spiketrains2 is None:
-            skeys = sorted(spiketrains.keys())
-
-            for idx1 in xrange(len(skeys)):
-                unit1 = skeys[idx1]
-                for idx2 in xrange(idx1 + 1, len(skeys)):
-                    unit2 = skeys[idx2]
-                    for i in xrange(len(alignment[(unit1, unit2)])):
-                        start = spiketrains[unit1][
-                                alignment[(unit1, unit2)][i][0]] / srate
-                        end = spiketrains[unit2][
-                              alignment[(unit1, unit2)][i][1]] / srate
-                        ax.plot(
-                            (start, end),
-                            (nneuron - idx1 - 1,
-                             nneuron - idx2 - 1),
-                                        c=(0, 0, 0),
-                                        ls=":")
+            pairs = [(idx1, idx2, idx2, rows1[idx2])
+                     for idx1 in xrange(len(skeys1))
+                     for idx2 in xrange(idx1 + 1, len(skeys1))]
+            skeys = skeys1
         else:
-            skeys1 = sorted(spiketrains.keys())
-            skeys2 = sorted(spiketrains2.keys())
-
-            for idx1 in xrange(len(skeys1)):
-                unit1 = skeys1[idx1]
-                for idx2 in xrange(len(skeys2)):
-                    unit2 = skeys2[idx2]
-                    for i in xrange(len(alignment[(unit1, unit2)])):
-                        start = spiketrains[unit1][
-                                alignment[(unit1, unit2)][i][0]] / srate
-                        end = spiketrains2[unit2][
-                              alignment[(unit1, unit2)][i][1]] / srate
-                        ax.plot(
-                            (start, end),
-                            (nneuron - idx1 - 1,
-                             nneuron - len(skeys1) -
-                             idx2 - 1 - offset),
-                                        c=(0, 0, 0),
-                                        ls=":")
+            pairs = [(idx1, idx2, len(skeys1) + idx2, rows2[idx2])
+                     for idx1 in xrange(len(skeys1))
+                     for idx2 in xrange(len(skeys2))]
+            skeys = skeys2
+        if windows is None:
+            windows_al = [None] * len(trains)
+        else:
+            windows_al = windows
+        segs = [_alignment_segments(trains[idx1], trains[tidx2],
+                                    alignment[(skeys1[idx1], skeys[idx2])],
+                                    rows1[idx1], row2, srate,
+                                    windows_al[idx1], windows_al[tidx2])
+                for idx1, idx2, tidx2, row2 in pairs
+                if (skeys1[idx1], skeys[idx2]) in alignment]
+        if len(segs) > 0:
+            ax.add_collection(
+                mpl.collections.LineCollection(
+                    sp.concatenate(segs), colors=[(0, 0, 0)],
+                    linestyles='dotted'))
 
     # plot spike labels if provided
-    labelList = ['TP', 'TPO', 'FP', 'FPA', 'FPAO', 'FN', 'FNO']
-    if label1 is not None:
-        idx = 0
-        for unit in sorted(spiketrains.keys()):
-            for i in xrange(len(label1[unit])):
-                if label1[unit][i] - 1 > 1:
-                    stri = labelList[label1[unit][i] - 1]
-                    ax.text(spiketrains[unit][i] / srate, nneuron - 1 - idx,
-                            stri)
-            idx += 1
-    if label2 is not None and spiketrains2 is not None:
-        for unit in sorted(spiketrains2.keys()):
-            for i in xrange(len(label2[unit])):
-                if label2[unit][i] - 1 > 1:
-                    stri = labelList[label2[unit][i] - 1]
-                    ax.text(spiketrains2[unit][i] / srate,
-                            nneuron - 1 - idx - offset, stri)
-            idx += 1
+    labelList = LABELS
+    labelMarkers = [None, None, 'v', '^', 's', 'o', 'D']
+    lab_sets = []
+    if label1 is not None and mode == 'raster':
+        lab_sets.append((label1, skeys1, 0, rows1))
+    if label2 is not None and spiketrains2 is not None and mode == 'raster':
+        lab_sets.append((label2, skeys2, len(skeys1), rows2))
+    lab_x = [[] for _ in labelList]
+    lab_y = [[] for _ in labelList]
+    for labels_set, skeys, first, rows in lab_sets:
+        trains_set = trains_win[first:first + len(skeys)]
+        for i, unit in enumerate(skeys):
+            u_lab = sp.asarray(labels_set[unit])
+            if windows is not None:
+                u_lab = u_lab[windows[first + i][0]:windows[first + i][1]]
+            for c in xrange(2, len(labelList)):
+                mask = u_lab == c + 1
+                if mask.any():
+                    lab_x[c].append(trains_set[i][mask] / srate)
+                    lab_y[c].append(sp.zeros(mask.sum()) + rows[i])
+    lab_x = [sp.concatenate(x) if len(x) > 0 else sp.array([]) for x in lab_x]
+    lab_y = [sp.concatenate(y) if len(y) > 0 else sp.array([]) for y in lab_y]
+    if sum([x.size for x in lab_x]) <= label_text_limit:
+        for c in xrange(2, len(labelList)):
+            for x, y in zip(lab_x[c], lab_y[c]):
+                ax.text(x, y, labelList[c])
+    else:
+        for c in xrange(2, len(labelList)):
+            if lab_x[c].size > 0:
+                ax.plot(lab_x[c], lab_y[c] + 0.3, ls='None',
+                        marker=labelMarkers[c], mfc='none', mec='k',
+                        label=labelList[c])
+        ax.legend(loc='upper right', numpoints=1)
 
             # beautfy the figure
             #    fig_ax.set_title('spiketrains all units')
@@ -188,7 +606,10 @@ def spike_trains(spiketrains, spiketrains2=None, alignment=None,
     ax.set_yticks(sp.arange(nneuron + offset) - offset)
     ax.set_yticklabels(labels[::-1])
     ax.set_ylim((-0.5 - offset, nneuron - .5))
-    #    ax.set_xlim((my_min_timesample-1, my_min_timesample+1))
+    if t_start is not None:
+        ax.set_xlim(xmin=t_start)
+    if t_stop is not None:
+        ax.set_xlim(xmax=t_stop)
 
     # produce plots
     if filename is not None:
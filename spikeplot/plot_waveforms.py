@@ -14,21 +14,256 @@ __all__ = ['waveforms']
 ##---IMPORTS
 
 import scipy as sp
-from .common import COLOURS, save_figure, check_plotting_handle, plt
+from .common import (COLOURS, CHUNK_SIZE, save_figure, check_plotting_handle,
+                     plt, mpl)
+
+
+##---CONSTANTS
+
+RESERVOIR_SIZE = 2000
+"""number of waveforms kept per unit when streaming over waveforms"""
 
 
 ##---FUNCTION
 
+def _waveform_segments(wf, srate=1.0):
+    """build the line segments for a set of waveforms in one go
+
+    The segments are returned as one ndarray of shape (nevent, nsample, 2)
+    that can be passed to a LineCollection as is. The sample axis is computed
+    once and broadcast against the waveforms, so no per-waveform temporaries
+    are created.
+
+    :Parameters:
+        wf : ndarray
+            The waveforms with one waveform per row.
+        srate : float
+            Scale factor for the sample axis.
+    :Returns:
+        ndarray
+            The segment array of shape (nevent, nsample, 2).
+    """
+
+    nevent, nsample = wf.shape
+    rval = sp.empty((nevent, nsample, 2))
+    rval[:, :, 0] = sp.arange(nsample) / float(srate)
+    rval[:, :, 1] = wf
+    return rval
+
+
+def _concat_channels(wf):
+    """return the channel concatenated representation of `wf`
+
+    Multichanneled waveforms of shape (nevent, nsample, nchannel) are
+    converted to shape (nevent, nchannel * nsample), with the channels of each
+    waveform concatenated along the rows. This is a single transpose/reshape,
+    so at most one copy is made and the dtype is preserved. Memory-mapped
+    inputs are only read, never written to. Waveforms with ndim < 3 are
+    returned as is.
+
+    :Parameters:
+        wf : ndarray
+            The waveforms, either as (nevent, nsample) or as
+            (nevent, nsample, nchannel).
+    :Returns:
+        ndarray
+            The waveforms as (nevent, nsample * nchannel).
+    """
+
+    wf = sp.asarray(wf)
+    if wf.ndim != 3:
+        return wf
+    return wf.transpose(0, 2, 1).reshape(wf.shape[0], -1)
+
+
+def _subsample_idx(nevent, nmax, method='random', seed=0):
+    """select a reproducible subset of at most `nmax` out of `nevent` rows
+
+    :Parameters:
+        nevent : int
+            Number of rows to select from.
+        nmax : int
+            Maximum number of rows to select.
+        method : str
+            'random' selects rows uniformly at random, 'stratified' divides
+            the rows into `nmax` consecutive strata (the rows are assumed to
+            be in temporal order) and selects one random row per stratum.
+        seed : int
+            Seed for the random number generator.
+    :Returns:
+        ndarray
+            Sorted row indices of the subset.
+    """
+
+    if nevent <= nmax:
+        return sp.arange(nevent)
+    rs = sp.random.RandomState(seed)
+    if method == 'random':
+        return sp.sort(rs.permutation(nevent)[:nmax])
+    elif method == 'stratified':
+        edges = sp.linspace(0, nevent, nmax + 1)
+        return (edges[:-1] +
+                sp.floor(rs.rand(nmax) * sp.diff(edges))).astype(int)
+    else:
+        raise ValueError('unknown subsample method: %s' % method)
+
+
+def _iter_chunks(wf, chunk_size=CHUNK_SIZE):
+    """yield the waveforms of a unit as channel concatenated chunks
+
+    :Parameters:
+        wf : ndarray or iterable
+            The waveforms of a unit. Arrays (incl. memory-mapped arrays) are
+            read in chunks of `chunk_size` rows, any other iterable is
+            expected to yield ndarray chunks of waveforms.
+        chunk_size : int
+            Number of waveforms per chunk for ndarray inputs.
+    :Returns:
+        generator
+            Yields ndarrays of shape (nevent_chunk, nsample).
+    """
+
+    if isinstance(wf, sp.ndarray):
+        for start in xrange(0, wf.shape[0], chunk_size):
+            yield _concat_channels(wf[start:start + chunk_size])
+    else:
+        for chunk in wf:
+            yield _concat_channels(chunk)
+
+
+def _stream_stats(chunks, nkeep=RESERVOIR_SIZE, seed=0):
+    """compute waveform statistics in a single pass over chunks of waveforms
+
+    Mean and variance are updated per chunk with the parallel form of
+    Welford's algorithm (Chan et al.), so only one chunk is in memory at a
+    time. Additionally a uniform random subset of at most `nkeep` waveforms
+    is kept by reservoir sampling, to be plotted and to estimate percentiles.
+
+    :Parameters:
+        chunks : iterable
+            Iterable yielding ndarrays of shape (nevent_chunk, nsample).
+        nkeep : int
+            Size of the reservoir.
+        seed : int
+            Seed for the reservoir sampling.
+    :Returns:
+        dict
+            With keys 'n' (event count), 'mean', 'std' (per sample), 'min',
+            'max' (overall) and 'sample' (the reservoir as ndarray).
+    """
+
+    rs = sp.random.RandomState(seed)
+    n = 0
+    mean = m2 = ymin = ymax = sample = None
+    for chunk in chunks:
+        chunk = sp.asarray(chunk, dtype=float)
+        m = chunk.shape[0]
+        if m == 0:
+            continue
+        c_mean = chunk.mean(axis=0)
+        c_m2 = ((chunk - c_mean) ** 2).sum(axis=0)
+        if n == 0:
+            mean, m2 = c_mean, c_m2
+            ymin, ymax = chunk.min(), chunk.max()
+            sample = sp.empty((nkeep, chunk.shape[1]))
+        else:
+            delta = c_mean - mean
+            mean = mean + delta * m / float(n + m)
+            m2 = m2 + c_m2 + delta ** 2 * n * m / float(n + m)
+            ymin = min(ymin, chunk.min())
+            ymax = max(ymax, chunk.max())
+        # reservoir sampling: fill first, then replace slot j ~ U[0, pos]
+        pos = sp.arange(n, n + m)
+        fill = pos < nkeep
+        sample[pos[fill]] = chunk[fill]
+        slot = (rs.rand(m) * (pos + 1)).astype(int)
+        keep = ~fill & (slot < nkeep)
+        sample[slot[keep]] = chunk[keep]
+        n += m
+    if n == 0:
+        raise ValueError('no waveforms to stream over')
+    return {'n':n, 'mean':mean, 'std':sp.sqrt(m2 / n), 'min':ymin,
+            'max':ymax, 'sample':sample[:min(n, nkeep)]}
+
+
+def _waveform_density(chunks, yrange, nbins=100):
+    """bin waveforms into a sample-by-amplitude histogram
+
+    Each chunk of waveforms is binned with a single bincount over the flat
+    (amplitude, sample) index, so only one chunk is in memory at a time.
+
+    :Parameters:
+        chunks : iterable
+            Iterable yielding ndarrays of shape (nevent_chunk, nsample).
+        yrange : tuple
+            The (min, max) amplitude range to bin. Values outside are put into
+            the outermost bins.
+        nbins : int
+            Number of amplitude bins.
+    :Returns:
+        ndarray
+            Histogram of shape (nbins, nsample) holding the counts.
+    """
+
+    ymin, ymax = float(yrange[0]), float(yrange[1])
+    scale = 0.0
+    if ymax > ymin:
+        scale = nbins / (ymax - ymin)
+    rval = None
+    for chunk in chunks:
+        chunk = sp.asarray(chunk, dtype=float)
+        nsample = chunk.shape[1]
+        if rval is None:
+            sample_idx = sp.arange(nsample)
+            rval = sp.zeros(nbins * nsample, dtype=int)
+        bin_idx = ((chunk - ymin) * scale).astype(int)
+        sp.clip(bin_idx, 0, nbins - 1, out=bin_idx)
+        rval += sp.bincount((bin_idx * nsample + sample_idx).ravel(),
+                            minlength=nbins * nsample)
+    return rval.reshape(nbins, nsample)
+
+
+def _density_image(hist, colour):
+    """build a RGBA image in `colour` with alpha scaled by log counts
+
+    :Parameters:
+        hist : ndarray
+            The histogram as returned by `_waveform_density`.
+        colour : object
+            Any matplotlib conform colour.
+    :Returns:
+        ndarray
+            RGBA image of shape hist.shape + (4,).
+    """
+
+    rval = sp.empty(hist.shape + (4,))
+    rval[..., :3] = mpl.colors.colorConverter.to_rgb(colour)
+    rval[..., 3] = sp.log1p(hist)
+    if hist.max() > 0:
+        rval[..., 3] /= sp.log1p(hist.max())
+    return rval
+
+
 def waveforms(waveforms, samples_per_second=None, tf=None, plot_mean=False,
               plot_single_waveforms=True, set_y_range=False,
               plot_separate=True, templates=None, plot_handle=None,
-              colours=None, title=None, filename=None, show=True):
+              colours=None, title=None, filename=None, show=True,
+              mode='lines', density_bins=100, max_waveforms=None,
+              subsample='random', seed=0, plot_band=None):
     """plot one set of spiketrains or two sets of spkitrains with their
     interspike alignment
 
     :Parameters:
         waveforms : dict
             Dict of ndarray, holding the waveforms for different units.
+            Multichanneled waveforms of shape (nevent, nsample, nchannel) are
+            converted to the channel concatenated representation, the dict
+            passed is not altered. Memory-mapped arrays and iterables yielding
+            chunks of waveforms are streamed over in a single pass with
+            bounded memory: mean, std and the event count are exact, while
+            single waveforms and percentile bands are taken from a random
+            subset of RESERVOIR_SIZE waveforms (for mode='density',
+            memory-mapped arrays are binned completely).
         plot_handle : figure or axis
             A reference to a figure or axis, or None if one has to be created.
         samples_per_second : int
@@ -37,6 +272,12 @@ def waveforms(waveforms, samples_per_second=None, tf=None, plot_mean=False,
             The template length of the waveforms
         plot_mean : bool
             If True, plot the mean-waveform per unit.
+        plot_band : str or float
+            Only used if plot_mean is True. If 'std', plot a band of one
+            standard deviation around the mean-waveform per unit. If a float p
+            in (0, 50), plot the band between the p-th and the (100-p)-th
+            percentile per unit. No band if None.
+            Default=None
         plot_single_waveforms : bool
             If True, plot the single waveforms per unit.
         plot_separate : bool
@@ -54,6 +295,27 @@ def waveforms(waveforms, samples_per_second=None, tf=None, plot_mean=False,
             If given and a valid path on the local system, save the figure.
         show : bool
             If True, show the figure.
+        mode : str
+            How to plot the single waveforms. 'lines' plots every waveform as
+            a line, 'density' bins the waveforms of each unit into a
+            sample-by-amplitude histogram and shows it as one image per unit.
+            Default='lines'
+        density_bins : int
+            Number of amplitude bins for mode='density'.
+            Default=100
+        max_waveforms : int
+            If not None, plot at most this many single waveforms per unit
+            with mode='lines'. Mean, bands and the event count are still
+            computed over all waveforms.
+            Default=None
+        subsample : str
+            How to select the subset for `max_waveforms`, either 'random' or
+            'stratified' (one random waveform per block of consecutive
+            waveforms).
+            Default='random'
+        seed : int
+            Seed for the subset selection, so plots are reproducible.
+            Default=0
     :Returns:
         matplotlib.figure
             Reference th the figure ploted on
@@ -68,8 +330,21 @@ def waveforms(waveforms, samples_per_second=None, tf=None, plot_mean=False,
         ax = None
 
     # checks and inits
+    if mode not in ['lines', 'density']:
+        raise ValueError('unknown mode: %s' % mode)
     if type(waveforms) is not dict:
         waveforms = {'0':waveforms}
+    data = {}
+    stats = {}
+    for k in waveforms:
+        if isinstance(waveforms[k], sp.ndarray) and \
+                not isinstance(waveforms[k], sp.memmap):
+            data[k] = _concat_channels(waveforms[k])
+            stats[k] = {'n':data[k].shape[0], 'min':data[k].min(),
+                        'max':data[k].max()}
+        else:
+            stats[k] = _stream_stats(_iter_chunks(waveforms[k]), seed=seed)
+            data[k] = stats[k]['sample']
     if colours is None:
         col_lst = COLOURS
     else:
@@ -77,39 +352,50 @@ def waveforms(waveforms, samples_per_second=None, tf=None, plot_mean=False,
     srate = 1.0
     if samples_per_second is not None:
         srate = samples_per_second
-    for k in waveforms.keys():
-        if waveforms[k].ndim == 3:
-            waveforms[k] = sp.vstack(
-                [sp.hstack(
-                    [waveforms[k][i, :, j]
-                     for j in xrange(waveforms[k].shape[-1])])
-                 for i in xrange(waveforms[k].shape[0])])
-    firstKey = waveforms.keys()[0]
-    nunits = len(waveforms)
-    my_ymin = waveforms[firstKey].min()
-    my_ymax = waveforms[firstKey].max()
-    my_xmax = waveforms[firstKey].shape[1] - 1
+    firstKey = sorted(data.keys())[0]
+    nunits = len(data)
+    my_ymin = stats[firstKey]['min']
+    my_ymax = stats[firstKey]['max']
+    my_xmax = data[firstKey].shape[1] - 1
 
     nc = 1
     if tf is not None:
-        nc = int(waveforms[firstKey].shape[1] / tf)
+        nc = int(data[firstKey].shape[1] / tf)
 
     # plot single wave forms
     if plot_single_waveforms is True:
         col_idx = 0
-        for u, k in enumerate(sorted(waveforms.keys())):
+        for u, k in enumerate(sorted(data.keys())):
             if plot_separate is True:
                 ax = fig.add_subplot(nunits, 1, u + 1, sharex=ax, sharey=ax)
-            nevent, nsample = waveforms[k].shape
-            my_ymin = min(my_ymin, waveforms[k].min())
-            my_ymax = max(my_ymax, waveforms[k].max())
-            my_xmax = max(my_xmax, waveforms[k].shape[1] - 1)
+            nevent, nsample = stats[k]['n'], data[k].shape[1]
+            u_ymin, u_ymax = stats[k]['min'], stats[k]['max']
+            my_ymin = min(my_ymin, u_ymin)
+            my_ymax = max(my_ymax, u_ymax)
+            my_xmax = max(my_xmax, nsample - 1)
             col = col_lst[col_idx % len(col_lst)]
             if plot_mean is True:
                 col = 'gray'
-            for i in xrange(waveforms[k].shape[0]):
-                ax.plot(sp.arange(nsample) / srate, waveforms[k][i, :],
-                        color=col)
+            if mode == 'density':
+                u_src = data[k]
+                if isinstance(waveforms[k], sp.memmap):
+                    u_src = waveforms[k]
+                u_hist = _waveform_density(_iter_chunks(u_src),
+                                           (u_ymin, u_ymax), density_bins)
+                ax.imshow(_density_image(u_hist, col),
+                          origin='lower', aspect='auto',
+                          interpolation='nearest',
+                          extent=(-0.5 / srate, (nsample - 0.5) / srate,
+                                  u_ymin, u_ymax))
+            else:
+                u_wf = data[k]
+                if max_waveforms is not None and len(u_wf) > max_waveforms:
+                    u_wf = u_wf[_subsample_idx(len(u_wf), max_waveforms,
+                                               subsample, seed)]
+                ax.add_collection(
+                    mpl.collections.LineCollection(
+                        _waveform_segments(u_wf, srate), colors=[col]))
+                ax.autoscale_view()
             col_idx += 1
 
             # addition: per axis event count
@@ -118,17 +404,32 @@ def waveforms(waveforms, samples_per_second=None, tf=None, plot_mean=False,
     # plot cluster means
     if plot_mean is True:
         col_idx = 0
-        for u, k in enumerate(sorted(waveforms.keys())):
+        for u, k in enumerate(sorted(data.keys())):
             if plot_separate is True:
                 ax = fig.axes[u]
             if templates is not None and k in templates:
                 my_mean = templates[k]
+            elif 'mean' in stats[k]:
+                my_mean = stats[k]['mean']
             else:
-                my_mean = waveforms[k].mean(axis=0)
-            nevent, nsample = waveforms[k].shape
+                my_mean = data[k].mean(axis=0)
+            nsample = data[k].shape[1]
             my_ymin = min(my_ymin, my_mean.min())
             my_ymax = max(my_ymax, my_mean.max())
             my_xmax = max(my_xmax, my_mean.size - 1)
+            if plot_band is not None:
+                if plot_band == 'std':
+                    if 'std' in stats[k]:
+                        u_std = stats[k]['std']
+                    else:
+                        u_std = data[k].std(axis=0)
+                    u_lo, u_hi = my_mean - u_std, my_mean + u_std
+                else:
+                    u_lo, u_hi = sp.percentile(
+                        data[k], [plot_band, 100 - plot_band], axis=0)
+                ax.fill_between(sp.arange(nsample) / srate, u_lo, u_hi,
+                                color=col_lst[col_idx % len(col_lst)],
+                                alpha=0.3, lw=0)
             ax.plot(sp.arange(nsample) / srate, my_mean,
                     c=col_lst[col_idx % len(col_lst)], lw=2)
             col_idx += 1
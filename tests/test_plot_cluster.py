@@ -9,3 +9,23 @@ cluster(
     my_data,
     title='Test Plot',
     plot_mean=2)
+
+# density mode
+cluster(
+    my_data,
+    title='Test Plot (density)',
+    plot_mean=2,
+    mode='density')
+
+# scatter matrix
+cluster(
+    {0:sp.randn(500, 3), 1:sp.randn(300, 3) + 2},
+    title='Test Plot (scatter matrix)',
+    plot_mean=1.0,
+    scatter_matrix=True)
+
+# covariance ellipses
+cluster(
+    my_data,
+    title='Test Plot (covariance)',
+    plot_cov=2.0)
@@ -1,5 +1,5 @@
 import scipy as sp
-from spikeplot import cluster_projection
+from spikeplot import cluster_projection, cluster_separability
 
 # get some data
 my_data = {
@@ -11,3 +11,6 @@ my_data = {
 
 # call the plot function on the axes
 cluster_projection(my_data)
+
+# separability metrics without plotting
+metrics = cluster_separability(my_data)
@@ -0,0 +1,33 @@
+import scipy as sp
+from spikeplot import correlograms, correlogram_counts
+
+# get some data
+mytrains = {0:sp.cumsum(sp.rand(500) * 100 + 20),
+            1:sp.cumsum(sp.rand(300) * 150 + 30),
+            2:sp.cumsum(sp.rand(400) * 120 + 10)}
+
+# call the plot function
+correlograms(
+    mytrains,
+    max_lag=200,
+    bin_size=5,
+    samples_per_second=24000,
+    plot_isi=True,
+    title='Test Plot')
+
+# compare with a brute force histogram of all lags on integer spike times
+inttrains = {0:sp.cumsum(sp.random.randint(1, 30, 200)),
+             1:sp.cumsum(sp.random.randint(1, 40, 150))}
+ccg = correlogram_counts(inttrains, max_lag=40, bin_size=4)
+nlag = 10
+for i in xrange(2):
+    for j in xrange(2):
+        lags = inttrains[j][None, :] - inttrains[i][:, None]
+        if i == j:
+            lags = lags[~sp.eye(lags.shape[0], dtype=bool)]
+        lags = lags.ravel()
+        bins = (sp.sign(lags) * sp.floor(sp.absolute(lags) / 4.0 + 0.5)
+                ).astype(int) + nlag
+        bins = bins[(bins >= 0) & (bins < 2 * nlag + 1)]
+        assert (ccg['counts'][i, j] ==
+                sp.bincount(bins, minlength=2 * nlag + 1)).all()
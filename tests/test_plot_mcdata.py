@@ -1,5 +1,8 @@
+import os
+import tempfile
 import scipy as sp
-from spikeplot import mcdata
+from spikeplot import mcdata, mcdata_pyramid
+from spikeplot.plot_mcdata import PYRAMID_SUFFIX
 
 ns, nc = 300 + 1000, 4
 tf = 65
@@ -21,3 +24,50 @@ mcdata(
     epochs=ep,
     events=ev,
     x_offset=-100)
+
+# min/max envelope decimation
+mcdata(
+    sp.randn(100000, nc),
+    other=sp.randn(100000, 2),
+    decimate=True)
+
+# raw int16 recording file, window read via memmap
+fd, rec = tempfile.mkstemp()
+os.close(fd)
+try:
+    (sp.randn(100000, nc) * 100).astype(sp.int16).tofile(rec)
+    mcdata(
+        rec,
+        nchan=nc,
+        gain=0.195,
+        x_offset=5000,
+        n_samples=10000,
+        decimate=True)
+
+    # window served from the min/max pyramid
+    mcdata_pyramid(rec, nc)
+    mcdata(
+        rec,
+        nchan=nc,
+        gain=0.195,
+        x_offset=1000,
+        pyramid=True)
+    mcdata(
+        rec,
+        nchan=nc,
+        gain=0.195,
+        x_offset=1000,
+        pyramid=True,
+        other=sp.randn(99000, 2))
+finally:
+    for path in [rec, rec + PYRAMID_SUFFIX]:
+        if os.path.exists(path):
+            os.remove(path)
+
+# stacked layout in one axe
+mcdata(
+    mydata,
+    other=myother,
+    events=ev,
+    epochs={0:ep},
+    stacked=True)
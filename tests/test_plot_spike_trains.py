@@ -1,5 +1,5 @@
 import scipy as sp
-from spikeplot import spike_trains
+from spikeplot import spike_trains, spike_train_alignment
 
 # inits
 mytrains = {0:sp.array([1, 3, 40, 50, 56]) * 100,
@@ -11,3 +11,66 @@ spike_trains(
     mytrains,
     alignment=alignment,
     samples_per_second=24000)
+
+# alignment as (k, 2) index array
+spike_trains(
+    mytrains,
+    alignment={(0, 1):sp.array([[1, 1], [2, 3], [4, 2]])},
+    samples_per_second=24000)
+
+# spike labels as category markers
+spike_trains(
+    mytrains,
+    label1={0:sp.array([1, 3, 4, 1, 6]), 1:sp.array([1, 1, 1, 7, 3, 1])},
+    label_text_limit=0)
+
+# time window
+spike_trains(
+    mytrains,
+    alignment=alignment,
+    samples_per_second=24000,
+    t_start=0.1,
+    t_stop=0.2)
+
+# binned firing rates
+spike_trains(
+    mytrains,
+    samples_per_second=24000,
+    mode='rate',
+    bin_size=0.05,
+    smooth=0.1)
+
+# computed alignment and labels against a second set
+mytrains2 = {'a':sp.array([2, 33, 39, 51, 70]) * 100,
+             'b':sp.array([4, 44, 67]) * 100}
+alignment, label1, label2 = spike_train_alignment(
+    mytrains, mytrains2, jitter=150, overlap=250)
+spike_trains(
+    mytrains,
+    mytrains2,
+    alignment=alignment,
+    label1=label1,
+    label2=label2,
+    samples_per_second=24000)
+
+# both spikes are matchable within the jitter, even though the closest
+# candidate pair (20, 16) would block the others
+alignment, label1, label2 = spike_train_alignment(
+    {0:sp.array([10, 20])}, {0:sp.array([16, 25])}, jitter=6)
+assert sorted(alignment.keys()) == [(0, 0)]
+assert (alignment[(0, 0)] == sp.array([[0, 0], [1, 1]])).all()
+assert (label1[0] == 1).all() and (label2[0] == 1).all()
+
+# unmatched spikes, matches with an unassigned unit and overlaps
+alignment, label1, label2 = spike_train_alignment(
+    {0:sp.array([100, 300]), 1:sp.array([310, 900])},
+    {'a':sp.array([101, 302]), 'b':sp.array([305, 500]), 'c':sp.array([103])},
+    jitter=5, overlap=20)
+assert sorted(alignment.keys()) == [(0, 'a'), (0, 'b'), (0, 'c'), (1, 'b')]
+assert (alignment[(0, 'a')] == sp.array([[0, 0], [1, 1]])).all()
+assert (alignment[(0, 'b')] == sp.array([[1, 0]])).all()
+assert (alignment[(0, 'c')] == sp.array([[0, 0]])).all()
+assert (alignment[(1, 'b')] == sp.array([[0, 0]])).all()
+assert (label1[0] == [1, 2]).all() and (label1[1] == [2, 6]).all()
+assert (label2['a'] == [2, 2]).all() and (label2['b'] == [2, 3]).all()
+assert (label2['c'] == [5]).all()
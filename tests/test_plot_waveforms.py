@@ -12,3 +12,30 @@ waveforms(
     plot_mean=True,
     plot_single_waveforms=True,
     plot_separate=True)
+
+# density mode
+waveforms(
+    my_data,
+    tf=50,
+    title='Test Plot (density)',
+    plot_mean=True,
+    plot_separate=True,
+    mode='density')
+
+# subsampled single waveforms with percentile band
+waveforms(
+    my_data,
+    tf=50,
+    title='Test Plot (subsampled)',
+    plot_mean=True,
+    plot_band=5.0,
+    max_waveforms=5,
+    subsample='stratified')
+
+# streamed from chunks with std band
+waveforms(
+    {0:(sp.randn(100, 50, 4) for _ in xrange(5)), 1:sp.randn(10, 200) + 2},
+    tf=50,
+    title='Test Plot (streamed)',
+    plot_mean=True,
+    plot_band='std')